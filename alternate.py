@@ -1,11 +1,13 @@
 import networkx as nx
 from util import *
+from bitgraph import BitGraph
 
 from multiprocessing import Pool
 from functools import partial
 
 from cleaning import cleaning
 from berge import check_subgraphs
+from pieces import piece_graphs
 from double_star import double_star_decomposition
 from two_join import find_7_hole, two_join_decomposition, ODD_HOLE_FOUND
 
@@ -19,7 +21,7 @@ def is_basic(graph : nx.Graph):
     except nx.NetworkXError:
         return False
 
-    if nx.is_bipartite(inv) or nx.is_bipartite(nx.complement(inv)):
+    if nx.is_bipartite(inv) or BitGraph(inv).complement().is_bipartite():
         return True
 
     return False
@@ -59,11 +61,22 @@ def odd_hole_check(Y, graph : nx.Graph):
     return True
 
 def is_berge_alt(graph : nx.Graph, pool : Pool):
-    Gc = nx.complement(graph)
+    # The graph is split first (see pieces.py) and the pieces checked in turn
+    G = BitGraph(graph)
 
-    if not check_subgraphs(graph, Gc, pool):
+    for H in piece_graphs(G):
+        if not is_berge_alt_piece(graph if H is G else H.to_networkx(), H, pool):
+            return False
+
+    return True
+
+def is_berge_alt_piece(graph : nx.Graph, G : BitGraph, pool : Pool):
+    if not check_subgraphs(G, G.complement(), pool):
         return False
 
+    # The decompositions below still work on networkx graphs
+    Gc = G.complement().to_networkx()
+
     if find_7_hole(graph, pool) or find_7_hole(Gc, pool):
         return False
 
@@ -0,0 +1,306 @@
+# Timing the recogniser and its detectors on seeded families of graphs.
+#
+#   python benchmark.py -o bench.json
+#   python benchmark.py -o new.json --compare bench.json
+#
+# Every routine is run on every family for a range of sizes, and the median
+# of a few runs is recorded. Once a routine takes longer than the budget on
+# a family, larger sizes of that family are skipped for it. A single run is
+# abandoned after the time limit and recorded as timed out, with no
+# seconds. A growth exponent k, with time ~ n^k, is fitted for each routine
+# and family by least squares on the log-log timings.
+#
+# With --compare, timings that got slower than the baseline by more than the
+# tolerance, or that now time out, are reported as regressions, and the exit
+# status is 1.
+
+import argparse
+import json
+import math
+import platform
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+import networkx as nx
+import numpy as np
+
+from contextlib import contextmanager
+from multiprocessing import Pool
+
+from util import random_bipartite, random_chordal
+from bitgraph import BitGraph
+from parallel import first_result, init_worker
+
+from berge import is_berge
+from alternate import is_berge_alt
+from jewel import find_jewel
+from pyramid import find_pyramid
+from configurations import find_config_T2, find_config_T3
+from cleaning import cleaning
+from near_cleaners import is_near_cleaner
+from two_join import find_2_join
+from double_star import double_star_decomposition
+
+SIZES = (8, 12, 16, 24, 32, 48)
+
+def line_of_bipartite(n):
+    # The line graph of a random bipartite graph with n edges
+    k = math.isqrt(n) + 1
+    return nx.line_graph(nx.bipartite.gnmk_random_graph(k, k, n))
+
+def lattice(n):
+    rows = max(1, math.isqrt(n))
+    return nx.grid_2d_graph(rows, n // rows)
+
+FAMILIES = {
+    "bipartite" : lambda n: random_bipartite(n // 2, n - n // 2, .3),
+    "line_bipartite" : line_of_bipartite,
+    "chordal" : lambda n: random_chordal(n, .3),
+    "cycle" : nx.cycle_graph,
+    "lattice" : lattice,
+}
+
+for name, family in list(FAMILIES.items()):
+    FAMILIES["complement_" + name] = (lambda family: lambda n: nx.complement(family(n)))(family)
+
+# Each routine is called as routine(graph, G, pool), with graph a networkx
+# graph and G a fresh BitGraph of it.
+ROUTINES = {
+    "is_berge" : lambda graph, G, pool: is_berge(G, pool=pool),
+    "is_berge_full" : lambda graph, G, pool: is_berge(G, pool=pool, fast_path=False),
+    "is_berge_alt" : lambda graph, G, pool: is_berge_alt(graph, pool),
+    "find_jewel" : lambda graph, G, pool: find_jewel(G, pool),
+    "find_pyramid" : lambda graph, G, pool: find_pyramid(G, pool),
+    "find_config_T2" : lambda graph, G, pool: find_config_T2(G, pool),
+    "find_config_T3" : lambda graph, G, pool: find_config_T3(G, pool),
+    "cleaning" : lambda graph, G, pool: cleaning(G),
+    "is_near_cleaner" : lambda graph, G, pool: first_result(pool, is_near_cleaner, G, cleaning(G, lazy=True)),
+    "find_2_join" : lambda graph, G, pool: find_2_join(G, pool),
+    "double_star_decomposition" : lambda graph, G, pool: list(double_star_decomposition(graph, pool)),
+}
+
+def make_graph(family, n, seed):
+    random.seed("%s/%d/%d" % (family, n, seed))
+    return nx.convert_node_labels_to_integers(FAMILIES[family](n))
+
+class Timeout(Exception):
+    pass
+
+@contextmanager
+def time_limit(seconds):
+    # Raises Timeout in the block after the given number of seconds. Only
+    # where there is SIGALRM; elsewhere runs are not limited.
+
+    if not hasattr(signal, "setitimer"):
+        yield
+        return
+
+    def expired(signum, frame):
+        raise Timeout()
+
+    previous = signal.signal(signal.SIGALRM, expired)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def time_routine(routine, graph, pool, repeats, limit):
+    # The median time of a few runs, or None if one of them timed out.
+
+    times = []
+
+    for i in range(repeats):
+        G = BitGraph(graph)
+
+        try:
+            with time_limit(limit):
+                start = time.perf_counter()
+                ROUTINES[routine](graph, G, pool)
+                times.append(time.perf_counter() - start)
+        except Timeout:
+            return None
+
+    return statistics.median(times)
+
+def growth_exponent(points):
+    # Slope of log(time) against log(n), or None with too few points.
+
+    points = [(n, t) for n, t in points if t > 0]
+
+    if len(points) < 2:
+        return None
+
+    n, t = np.log(np.array(points)).T
+    return float(np.polyfit(n, t, 1)[0])
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"],
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(routines, families, sizes, make_pool, repeats, budget, limit, seed, log=sys.stderr):
+    results = []
+    pool = make_pool()
+
+    try:
+        for routine in routines:
+            for family in families:
+                for n in sizes:
+                    graph = make_graph(family, n, seed)
+                    seconds = time_routine(routine, graph, pool, repeats, limit)
+
+                    results.append({
+                        "routine" : routine,
+                        "family" : family,
+                        "n" : graph.number_of_nodes(),
+                        "seconds" : seconds,
+                    })
+
+                    if seconds is None:
+                        print("%-26s %-26s n=%-4d timed out" % (routine, family, graph.number_of_nodes()), file=log, flush=True)
+
+                        # The abandoned run may have left work on the pool
+                        if pool is not None:
+                            pool.terminate()
+                            pool = make_pool()
+
+                        break
+
+                    print("%-26s %-26s n=%-4d %.4fs" % (routine, family, graph.number_of_nodes(), seconds), file=log, flush=True)
+
+                    if seconds > budget:
+                        break
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    exponents = {}
+
+    for routine in routines:
+        for family in families:
+            points = [(r["n"], r["seconds"]) for r in results
+                      if r["routine"] == routine and r["family"] == family
+                      and r["seconds"] is not None]
+
+            exponents.setdefault(routine, {})[family] = growth_exponent(points)
+
+    return results, exponents
+
+def regressions(results, baseline, tolerance, min_seconds):
+    # The timings slower than the baseline's by more than the tolerance, as
+    # (result, baseline seconds), including runs that time out now but
+    # didn't before. Very short timings are ignored as noise.
+
+    before = {(r["routine"], r["family"], r["n"]) : r["seconds"] for r in baseline["results"]}
+    slower = []
+
+    for r in results:
+        key = (r["routine"], r["family"], r["n"])
+
+        if key not in before or before[key] is None:
+            continue
+
+        old = before[key]
+
+        if r["seconds"] is None:
+            slower.append((r, old))
+            continue
+
+        if max(old, r["seconds"]) < min_seconds:
+            continue
+
+        if r["seconds"] > old * (1 + tolerance):
+            slower.append((r, old))
+
+    return slower
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Berge recognition routines.")
+
+    parser.add_argument("-o", "--output", help="write the results here as JSON")
+    parser.add_argument("--compare", help="a previous JSON output to compare against")
+    parser.add_argument("-j", "--cores", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--sequential", action="store_true", help="run without a pool (is_berge_alt is skipped)")
+    parser.add_argument("--routines", nargs="+", default=list(ROUTINES), choices=list(ROUTINES))
+    parser.add_argument("--families", nargs="+", default=list(FAMILIES), choices=list(FAMILIES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(SIZES))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--budget", type=float, default=5, help="seconds after which larger sizes are skipped")
+    parser.add_argument("--limit", type=float, default=60, help="seconds after which a single run is abandoned")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=.25, help="relative slowdown counted as a regression")
+    parser.add_argument("--min-seconds", type=float, default=.01, help="timings below this are not compared")
+
+    args = parser.parse_args(argv)
+
+    routines = args.routines
+
+    if args.sequential:
+        # is_berge_alt hands its work straight to the pool
+        routines = [r for r in routines if r != "is_berge_alt"]
+
+    def make_pool():
+        if args.sequential:
+            return None
+
+        return Pool(args.cores, initializer=init_worker)
+
+    results, exponents = run(routines, args.families, args.sizes, make_pool,
+        args.repeats, args.budget, args.limit, args.seed)
+
+    output = {
+        "meta" : {
+            "commit" : git_commit(),
+            "python" : platform.python_version(),
+            "networkx" : nx.__version__,
+            "cores" : args.cores,
+            "sequential" : args.sequential,
+            "repeats" : args.repeats,
+            "limit" : args.limit,
+            "seed" : args.seed,
+            "time" : time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results" : results,
+        "exponents" : exponents,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=1)
+
+    for routine in routines:
+        fitted = ", ".join(
+            "%s %.2f" % (family, k)
+            for family, k in exponents[routine].items() if k is not None)
+
+        print("%-26s %s" % (routine, fitted), file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+        slower = regressions(results, baseline, args.tolerance, args.min_seconds)
+
+        for r, old in slower:
+            now = "timed out" if r["seconds"] is None else "%.4fs" % r["seconds"]
+
+            print("REGRESSION %s on %s n=%d: %.4fs -> %s" % (
+                r["routine"], r["family"], r["n"], old, now), file=sys.stderr)
+
+        if slower:
+            return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,68 +2,395 @@
 # "Recognising Berge Graphs" - Chudnovsky, Cornuéjols, Liu, Seymour and Vušcović 2003
 
 import networkx as nx
+import queue
 
 from multiprocessing import Pool
-from functools import partial
 
 from jewel import find_jewel
 from configurations import find_config_T2, find_config_T3
 from pyramid import find_pyramid
 from cleaning import cleaning
 from near_cleaners import is_near_cleaner
+from bitgraph import BitGraph, as_bitgraph
+from parallel import first_result, init_worker, CancelFlag, watching
+from pieces import piece_graphs
+from fastpath import perfect_class
+from certificates import certificate_from
+from stats import Stats, recording, phase, note_found, note_class, is_recording
 
 
-def check_subgraphs(graph : nx.Graph, Gc : nx.Graph, pool : Pool):
+# The detectors of routine 2, in the order they are run. Each is run on the
+# graph and then on its complement.
+SUBGRAPH_DETECTORS = (
+    ("jewel", find_jewel),
+    ("T2", find_config_T2),
+    ("T3", find_config_T3),
+    ("pyramid", find_pyramid),
+)
+
+def subgraph_obstruction(graph : nx.Graph, Gc : nx.Graph, pool : Pool):
     # First we check the graph and its compliment for some subgraphs
     # This is routine 2
 
-    if find_jewel(graph, pool):
-        return False
+    # Returns (detector, side, frame) for the first one found, where side is
+    # "G" or "complement", or None.
+
+    for name, find in SUBGRAPH_DETECTORS:
+        for side, H in (("G", graph), ("complement", Gc)):
+            with phase(name), phase(side):
+                frame = find(H, pool)
+
+            if frame:
+                return (name, side, frame)
+
+    return None
+
+def check_subgraphs(graph : nx.Graph, Gc : nx.Graph, pool : Pool):
+    return subgraph_obstruction(graph, Gc, pool) is None
+
+def near_cleaner_found(X, graph : BitGraph):
+    # is_near_cleaner for first_result, which needs a truthy result even
+    # when the near cleaner is empty.
+
+    if is_near_cleaner(X, graph):
+        return (X,)
+
+    return None
+
+def find_obstruction(graph : BitGraph, pool : Pool, fast_path=True):
+    # The whole recognition algorithm on one graph. Without a pool it runs
+    # in this process.
+
+    # Returns None if the graph is Berge, and otherwise (detector, side,
+    # witness) for whatever showed it is not: a frame from routine 2, or a
+    # near cleaner X as a tuple of labels. The graph is split first (see
+    # pieces.py) and the pieces checked one after another. With fast_path,
+    # pieces in one of the classes of fastpath.py are passed straight away.
+
+    located = locate_obstruction(graph, pool, fast_path)
+
+    if located is None:
+        return None
+
+    return located[1]
+
+def locate_obstruction(graph : BitGraph, pool : Pool, fast_path=True):
+    # As find_obstruction, but returns (piece, obstruction), with the piece
+    # the obstruction was found in as a graph. Frames only mean something in
+    # their own piece.
+
+    with phase("split"):
+        graphs = piece_graphs(graph)
+
+    for H in graphs:
+        if fast_path:
+            with phase("fast_path"):
+                name = perfect_class(H)
+
+            if name:
+                note_class(name)
+                continue
+
+        found = piece_obstruction(H, pool)
+
+        if found:
+            return H, found
+
+    return None
+
+def piece_obstruction(graph : BitGraph, pool : Pool):
+    # find_obstruction on a graph that is connected and anticonnected.
+
+    Gc = graph.complement()
+
+    with phase("subgraphs"):
+        found = subgraph_obstruction(graph, Gc, pool)
+
+    if not found:
+        with phase("near_cleaners"):
+            for side, H in (("G", graph), ("complement", Gc)):
+                with phase(side):
+                    hit = first_result(pool, near_cleaner_found, H, cleaning(H, lazy=True))
+
+                if hit:
+                    found = ("near_cleaner", side, tuple(H.to_labels(hit[0])))
+                    break
+
+    if found:
+        note_found(*found[:2])
+
+    return found
+
+def check_berge(graph : BitGraph, pool : Pool, fast_path=True):
+    return find_obstruction(graph, pool, fast_path) is None
+
+def find_certificate(graph : nx.Graph, pool : Pool, fast_path=True):
+    # None if the graph is Berge, and otherwise ("hole", vs) or
+    # ("antihole", vs) for an odd hole or antihole, which
+    # certificates.verify_certificate checks. Without a pool it runs in this
+    # process.
+
+    located = locate_obstruction(as_bitgraph(graph), pool, fast_path)
+
+    if located is None:
+        return None
+
+    # A hole or antihole of the piece is one of the whole graph, as the
+    # piece is an induced subgraph
+    piece, found = located
+
+    with phase("certificate"):
+        return certificate_from(piece, found, pool)
+
+def check_berge_whole(graph : BitGraph, witness=False, fast_path=True, certificate=False, cancel=None):
+    # Worker side of is_berge_many for graphs checked in a single worker.
+    # Raises Cancelled once the CancelFlag behind cancel is set.
+
+    if cancel is not None:
+        with watching(cancel):
+            return check_berge_whole(graph, witness, fast_path, certificate)
+
+    if certificate:
+        return find_certificate(graph, None, fast_path)
+
+    if witness:
+        return find_obstruction(graph, None, fast_path)
+
+    return check_berge(graph, None, fast_path)
+
+# Graphs on fewer vertices than this are checked whole by a single worker in
+# is_berge_many; larger ones get the pool to themselves.
+SMALL_GRAPH_LIMIT = 32
+
+# Number of small graphs is_berge_many has queued on the pool at once
+BATCH_WINDOW = 256
+
+
+class BergeRecognizer():
+    # A long lived recogniser which owns a pool of worker processes and keeps
+    # it warm between calls, for callers checking many graphs. Use it as a
+    # context manager, or call close() when done. If a pool is passed in it
+    # is used as is and left open.
+    #
+    # The relabelled graph and its complement are built once per call and
+    # shared by every detector, along with whatever they memoise on them
+    # (see BitGraph.memo). Workers keep their decoded copies of recent graphs
+    # in the same way.
+    #
+    # With a cache (see cache.ResultCache), graphs isomorphic to one already
+    # checked are answered from it. With a stats_log, every is_berge call is
+    # instrumented (see stats.Stats) and written to it as a line of JSON.
+    #
+    # Unless fast_path is turned off, graphs in one of the classes of
+    # fastpath.py skip the full algorithm; the class matched is recorded in
+    # the stats.
+
+    def __init__(self, n_cores=None, pool : Pool = None, cache = None, stats_log = None, fast_path=True):
+        self.n_cores = n_cores
+        self.pool = pool
+        self.owns_pool = pool is None
+        self.cache = cache
+        self.stats_log = stats_log
+        self.fast_path = fast_path
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start(self):
+        if self.pool is None:
+            self.pool = Pool(self.n_cores, initializer=init_worker)
+
+    def close(self):
+        if self.owns_pool and self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def is_berge(self, graph : nx.Graph, stats=False):
+        # With stats, returns (result, Stats) for this call.
+
+        graph = as_bitgraph(graph)
+
+        if not stats and self.stats_log is None:
+            return self.verdict(graph)
+
+        recorder = Stats()
+
+        with recording(recorder), phase("is_berge"):
+            result = self.verdict(graph)
+
+        if self.stats_log is not None:
+            recorder.write(self.stats_log, n=graph.n, berge=result)
+
+        if stats:
+            return result, recorder
+
+        return result
+
+    def verdict(self, graph : BitGraph):
+        if self.cache is None:
+            return self.check(graph)
+
+        result = self.cache.get(graph)
+
+        if result is None:
+            result = self.check(graph)
+            self.cache.put(graph, result)
+
+        return result
+
+    def check(self, graph : BitGraph):
+        # Graphs that split (see pieces.py) have their pieces checked with
+        # is_berge_many, so small pieces run side by side on the workers.
+        # While stats are being recorded the pieces are checked here
+        # instead, one after another, so what they find is recorded too.
+
+        self.start()
+
+        if is_recording():
+            return check_berge(graph, self.pool, self.fast_path)
+
+        with phase("split"):
+            graphs = piece_graphs(graph)
+
+        if len(graphs) == 1 and graphs[0] is graph:
+            return check_berge(graph, self.pool, self.fast_path)
+
+        results = self.is_berge_many(graphs, ordered=False)
+
+        try:
+            return all(result for i, result in results)
+        finally:
+            # Cancels the pieces still out on the pool
+            results.close()
+
+    def find_obstruction(self, graph : nx.Graph):
+        # See find_obstruction. The cache only holds verdicts, so isn't used.
+
+        self.start()
+
+        return find_obstruction(as_bitgraph(graph), self.pool, self.fast_path)
+
+    def find_certificate(self, graph : nx.Graph):
+        # See find_certificate.
+
+        self.start()
+
+        return find_certificate(as_bitgraph(graph), self.pool, self.fast_path)
+
+    def is_berge_many(self, graphs, ordered=True, threshold=SMALL_GRAPH_LIMIT, window=BATCH_WINDOW, witness=False, certificate=False):
+        # Checks many graphs, parallelising across them rather than inside
+        # each one. Graphs below the threshold are handed whole to a worker,
+        # at most window at a time; larger ones are checked here using the
+        # whole pool, while the small ones already queued carry on.
+        #
+        # Yields the results in input order if ordered, and otherwise pairs
+        # (index, result) as they complete. With witness, each result is
+        # what find_obstruction returns instead of a verdict, and with
+        # certificate it is what find_certificate returns; the cache isn't
+        # used for either. Graphs still out on the pool when the generator is
+        # closed are cancelled.
+
+        self.start()
+
+        cache = None if witness or certificate else self.cache
+
+        done = queue.SimpleQueue()
+        waiting = {}     # index -> graph, for graphs out on the pool
+        finished = {}    # index -> result, not yet yielded
+        next_index = 0
+
+        def collect():
+            i, result, error = done.get()
+
+            if error is not None:
+                raise error
+
+            graph = waiting.pop(i)
+
+            if cache is not None:
+                cache.put(graph, result)
+
+            finished[i] = result
+
+        def ready():
+            nonlocal next_index
+
+            if ordered:
+                while next_index in finished:
+                    yield finished.pop(next_index)
+                    next_index += 1
+
+            else:
+                results = list(finished.items())
+                finished.clear()
+
+                yield from results
+
+        def submit(i, graph):
+            waiting[i] = graph
+
+            self.pool.apply_async(
+                check_berge_whole, (graph, witness, self.fast_path, certificate, cancel.handle),
+                callback=lambda result: done.put((i, result, None)),
+                error_callback=lambda error: done.put((i, None, error)))
+
+        with CancelFlag() as cancel:
+            for i, graph in enumerate(graphs):
+                graph = as_bitgraph(graph)
+
+                result = cache.get(graph) if cache is not None else None
 
-    if find_jewel(Gc, pool):
-        return False
+                if result is not None:
+                    finished[i] = result
 
-    if find_config_T2(graph, pool):
-        return False
+                elif graph.n >= threshold and certificate:
+                    finished[i] = self.find_certificate(graph)
 
-    if find_config_T2(Gc, pool):
-        return False
+                elif graph.n >= threshold and witness:
+                    finished[i] = self.find_obstruction(graph)
 
-    if find_config_T3(graph, pool):
-        return False
+                elif graph.n >= threshold:
+                    finished[i] = self.check(graph)
 
-    if find_config_T3(Gc, pool):
-        return False
+                    if cache is not None:
+                        cache.put(graph, finished[i])
 
-    if find_pyramid(graph, pool):
-        return False
+                else:
+                    submit(i, graph)
 
-    if find_pyramid(Gc, pool):
-        return False
+                    while len(waiting) >= window:
+                        collect()
 
-    return True
+                while not done.empty():
+                    collect()
 
+                yield from ready()
 
-def is_berge(graph : nx.Graph, n_cores=None, pool = None):
+            while waiting:
+                collect()
 
-    if pool is None:
-        pool = Pool(n_cores)
+                yield from ready()
 
-    Gc = nx.complement(graph)
 
-    if not check_subgraphs(graph, Gc, pool):
-        return False
+def is_berge(graph : nx.Graph, n_cores=None, pool = None, cache = None, stats=False, fast_path=True):
 
-    check = partial(is_near_cleaner, graph=graph)
+    if pool is not None:
+        return BergeRecognizer(pool=pool, cache=cache, fast_path=fast_path).is_berge(graph, stats)
 
-    for near_cleaner_found in pool.imap_unordered(check, cleaning(graph)):
-        if (near_cleaner_found):
-            return False
+    with BergeRecognizer(n_cores, cache=cache, fast_path=fast_path) as recogniser:
+        return recogniser.is_berge(graph, stats)
 
-    check = partial(is_near_cleaner, graph=Gc)
+def is_berge_many(graphs, n_cores=None, pool = None, cache = None, fast_path=True, **options):
+    # See BergeRecognizer.is_berge_many.
 
-    for near_cleaner_found in pool.imap_unordered(check, cleaning(Gc)):
-        if (near_cleaner_found):
-            return False
+    if pool is not None:
+        yield from BergeRecognizer(pool=pool, cache=cache, fast_path=fast_path).is_berge_many(graphs, **options)
+        return
 
-    return True
\ No newline at end of file
+    with BergeRecognizer(n_cores, cache=cache, fast_path=fast_path) as recogniser:
+        yield from recogniser.is_berge_many(graphs, **options)
@@ -0,0 +1,489 @@
+# A compact graph representation for the detection routines.
+#
+# The vertices of a networkx graph are relabelled 0..n-1 and each
+# neighbourhood is stored as a single Python int used as a bitmask, so the
+# set operations in the hot loops of the detectors become integer operations
+# instead of building fresh Python sets from networkx dicts.
+
+import networkx as nx
+import numpy as np
+
+from itertools import combinations, islice
+
+UNREACHABLE = np.iinfo(np.int32).max // 2
+
+def bit(v):
+    return 1 << v
+
+def members(mask):
+    # Yields the vertices in a mask, in increasing order.
+
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def mask_of(vs):
+    mask = 0
+
+    for v in vs:
+        mask |= bit(v)
+
+    return mask
+
+def lowest(mask):
+    return (mask & -mask).bit_length() - 1
+
+def size(mask):
+    return mask.bit_count()
+
+class BitGraph():
+    def __init__(self, graph : nx.Graph = None):
+        self.labels = []
+        self.index = {}
+        self.adj = []
+
+        # Precomputations derived from the graph, kept for as long as the
+        # graph itself.
+        self.memo = {}
+
+        if graph is None:
+            return
+
+        self.labels = list(graph.nodes)
+        self.index = {v : i for i, v in enumerate(self.labels)}
+
+        self.adj = [0] * len(self.labels)
+
+        for u, v in graph.edges:
+            if u == v:
+                continue
+
+            i, j = self.index[u], self.index[v]
+
+            self.adj[i] |= bit(j)
+            self.adj[j] |= bit(i)
+
+    def __getstate__(self):
+        # The index can be rebuilt from the labels, so don't ship it.
+        return (self.labels, self.adj)
+
+    def __setstate__(self, state):
+        self.labels, self.adj = state
+        self.index = {v : i for i, v in enumerate(self.labels)}
+        self.memo = {}
+
+    def __len__(self):
+        return len(self.adj)
+
+    @property
+    def n(self):
+        return len(self.adj)
+
+    @property
+    def full(self):
+        return (1 << len(self.adj)) - 1
+
+    # Conversion between labels and indices
+
+    def to_label(self, v):
+        return self.labels[v]
+
+    def to_labels(self, vs):
+        if isinstance(vs, int):
+            vs = members(vs)
+
+        return [self.labels[v] for v in vs]
+
+    def from_label(self, v):
+        return self.index[v]
+
+    def from_labels(self, vs):
+        # Returns the mask of a collection of labels. Masks are passed through.
+
+        if isinstance(vs, int):
+            return vs
+
+        mask = 0
+
+        for v in vs:
+            mask |= bit(self.index[v])
+
+        return mask
+
+    def subgraph(self, S):
+        # The subgraph induced on the mask S, keeping the labels.
+
+        vs = list(members(S))
+        position = {v : i for i, v in enumerate(vs)}
+
+        adj = [0] * len(vs)
+
+        for i, v in enumerate(vs):
+            for u in members(self.adj[v] & S):
+                adj[i] |= bit(position[u])
+
+        graph = BitGraph()
+        graph.labels = [self.labels[v] for v in vs]
+        graph.index = {label : i for i, label in enumerate(graph.labels)}
+        graph.adj = adj
+
+        return graph
+
+    def to_networkx(self):
+        graph = nx.Graph()
+        graph.add_nodes_from(self.labels)
+        graph.add_edges_from((self.labels[u], self.labels[v]) for u, v in self.edges())
+
+        return graph
+
+    def complement(self):
+        # The complement of the graph, sharing its labels. The adjacency is
+        # just the inverted bitmasks, so no networkx graph is built; it is
+        # made once and cached, and its own complement is this graph.
+
+        if "complement" not in self.memo:
+            full = self.full
+
+            Gc = BitGraph()
+            Gc.labels = self.labels
+            Gc.index = self.index
+            Gc.adj = [full & ~N & ~bit(v) for v, N in enumerate(self.adj)]
+
+            Gc.memo["complement"] = self
+            self.memo["complement"] = Gc
+
+        return self.memo["complement"]
+
+    def is_bipartite(self):
+        # Two-colours each component by breadth first search, one layer at a
+        # time. An edge inside the side being expanded is an odd cycle.
+
+        unseen = self.full
+
+        while unseen:
+            frontier = unseen & -unseen
+            sides = [frontier, 0]
+            k = 0
+
+            while frontier:
+                N = self.neighbourhood(frontier)
+
+                if N & sides[k]:
+                    return False
+
+                k ^= 1
+                frontier = N & ~sides[k]
+                sides[k] |= frontier
+
+            unseen &= ~(sides[0] | sides[1])
+
+        return True
+
+    # Basic queries
+
+    def has_edge(self, u, v):
+        return (self.adj[u] >> v) & 1 == 1
+
+    def edges(self):
+        for u in range(self.n):
+            for v in members(self.adj[u] >> (u + 1) << (u + 1)):
+                yield (u, v)
+
+    def vertex_combinations(self, n):
+        return combinations(range(self.n), n)
+
+    def neighbourhood(self, S):
+        N = 0
+
+        for v in members(S):
+            N |= self.adj[v]
+
+        return N
+
+    def non_neighbourhood(self, S):
+        # The neighbourhood of S in the complement of the graph.
+
+        full = self.full
+        N = 0
+
+        for v in members(S):
+            N |= full & ~self.adj[v] & ~bit(v)
+
+        return N
+
+    def complete_verts(self, X):
+        # Returns all the X-complete vertices in the graph.
+
+        if X == 0:
+            return 0
+
+        C = self.full
+
+        for x in members(X):
+            C &= self.adj[x]
+
+        return C
+
+    def edges_between(self, us, vs):
+        return {
+            (u, v)
+            for u in us
+            for v in vs
+            if self.has_edge(u, v)
+        }
+
+    def is_cycle(self, S):
+        # Whether G|S is a cycle: connected, with every vertex having exactly
+        # two neighbours in S.
+
+        if not S:
+            return False
+
+        for v in members(S):
+            if (self.adj[v] & S).bit_count() != 2:
+                return False
+
+        return next(self.components(S)) == S
+
+    def is_path(self, S):
+        # Whether G|S is a path: connected, with no vertex having more than
+        # two neighbours in S and one edge fewer than it has vertices.
+
+        if not S:
+            return False
+
+        degrees = 0
+
+        for v in members(S):
+            d = (self.adj[v] & S).bit_count()
+
+            if d > 2:
+                return False
+
+            degrees += d
+
+        return degrees == 2 * (size(S) - 1) and next(self.components(S)) == S
+
+    # Connectivity
+
+    def components(self, S):
+        # Yields the vertex sets of the components of G|S as masks.
+
+        while S:
+            comp = S & -S
+            frontier = comp
+
+            while frontier:
+                frontier = self.neighbourhood(frontier) & S & ~comp
+                comp |= frontier
+
+            S &= ~comp
+            yield comp
+
+    def anticomponents(self, S):
+        # Yields the vertex sets of the components of the complement of G|S.
+        # A vertex outside the current piece is in its anticomponent exactly
+        # when it misses some vertex of the frontier.
+
+        while S:
+            comp = S & -S
+            frontier = comp
+
+            while frontier:
+                frontier = S & ~comp & ~self.complete_verts(frontier)
+                comp |= frontier
+
+            S &= ~comp
+            yield comp
+
+    def bfs_layers(self, u, allowed):
+        # Breadth first search from u through the vertices of allowed. Returns
+        # the list of layers as masks.
+
+        layers = [bit(u)]
+        seen = bit(u)
+
+        while True:
+            nxt = self.neighbourhood(layers[-1]) & allowed & ~seen
+
+            if not nxt:
+                return layers
+
+            seen |= nxt
+            layers.append(nxt)
+
+    def path_through(self, S, u, v):
+        # Returns a shortest path from u to v in G with all its interior
+        # vertices in S if one exists.
+
+        allowed = S | bit(u) | bit(v)
+        layers = self.bfs_layers(u, allowed)
+
+        for k, layer in enumerate(layers):
+            if (layer >> v) & 1:
+                break
+        else:
+            return None
+
+        path = [v]
+
+        for layer in reversed(layers[:k]):
+            path.append(lowest(self.adj[path[-1]] & layer))
+
+        path.reverse()
+
+        return path
+
+    def shortest_path(self, u, v):
+        return self.path_through(self.full, u, v)
+
+    def all_shortest_paths(self, u, v):
+        # Yields every shortest path between u and v.
+
+        layers = self.bfs_layers(u, self.full)
+
+        for k, layer in enumerate(layers):
+            if (layer >> v) & 1:
+                break
+        else:
+            return
+
+        def step(path, k):
+            if k == 0:
+                yield path[::-1]
+                return
+
+            for w in members(self.adj[path[-1]] & layers[k-1]):
+                yield from step(path + [w], k-1)
+
+        yield from step([v], k)
+
+    def shortest_path_without_interior_neighbours(self, u, v, forbidden_neighbours):
+        for path in self.all_shortest_paths(u, v):
+            N = self.neighbourhood(mask_of(path[1:-1]))
+
+            if not N & forbidden_neighbours:
+                return path
+
+        return None
+
+    def distance_tables(self, X=0):
+        # One breadth first search per source, where only vertices outside X
+        # may be interior to a path. Returns (dist, pred): dist[x, y] is the
+        # length of a shortest such path from x to y (UNREACHABLE if there is
+        # none) and pred[x, y] is the vertex before y on one of them.
+
+        n = self.n
+
+        dist = np.full((n, n), UNREACHABLE, dtype=np.int32)
+        pred = np.full((n, n), -1, dtype=np.int32)
+
+        interior = self.full & ~X
+
+        for x in range(n):
+            dist[x, x] = 0
+
+            seen = bit(x)
+            frontier = bit(x)
+            d = 0
+
+            while frontier:
+                d += 1
+                nxt = 0
+
+                for u in members(frontier):
+                    new = self.adj[u] & ~seen & ~nxt
+
+                    for v in members(new):
+                        dist[x, v] = d
+                        pred[x, v] = u
+
+                    nxt |= new
+
+                seen |= nxt
+                frontier = nxt & interior
+
+        return dist, pred
+
+    def distances(self):
+        # The all pairs distance matrix of G, computed once per graph.
+
+        if "distances" not in self.memo:
+            self.memo["distances"] = self.distance_tables()[0]
+
+        return self.memo["distances"]
+
+    # Paths
+
+    def induced_paths(self, k, reverse=True):
+        # Yields the induced paths on k vertices as tuples, using an explicit
+        # stack. Each path comes in both orientations, unless reverse is
+        # False in which case only the one starting at its smaller end.
+
+        adj = self.adj
+
+        for start in range(self.n):
+            if k == 1:
+                yield (start,)
+                continue
+
+            # cands[d] holds the vertices which can follow path[d], and
+            # closed[d] the closed neighbourhood of path[:d+1]. A vertex can
+            # only extend the path if it misses everything before its
+            # predecessor.
+
+            path = [start]
+            cands = [adj[start]]
+            closed = [adj[start] | bit(start)]
+
+            while cands:
+                if not cands[-1]:
+                    cands.pop()
+                    closed.pop()
+                    path.pop()
+                    continue
+
+                low = cands[-1] & -cands[-1]
+                cands[-1] ^= low
+                u = low.bit_length() - 1
+
+                if len(path) + 1 == k:
+                    if reverse or u > start:
+                        yield (*path, u)
+
+                    continue
+
+                path.append(u)
+                cands.append(adj[u] & ~closed[-1])
+                closed.append(closed[-1] | adj[u] | low)
+
+    def induced_path_batches(self, k, reverse=True, batch_size=4096):
+        # The same paths as induced_paths, as arrays of up to batch_size
+        # rows for vectorised consumers.
+
+        paths = self.induced_paths(k, reverse)
+
+        while True:
+            batch = np.array(list(islice(paths, batch_size)), dtype=np.intp)
+
+            if len(batch) == 0:
+                return
+
+            yield batch
+
+def from_adjacency(adj):
+    # A BitGraph on the vertices 0..n-1, with the given neighbourhood masks.
+
+    graph = BitGraph()
+    graph.labels = list(range(len(adj)))
+    graph.index = {v : v for v in graph.labels}
+    graph.adj = adj
+
+    return graph
+
+def as_bitgraph(graph):
+    if isinstance(graph, BitGraph):
+        return graph
+
+    return BitGraph(graph)
@@ -0,0 +1,232 @@
+# Remembering is_berge results across isomorphic graphs.
+#
+# Each graph gets a certificate which isomorphic graphs share. Colour
+# refinement splits the vertices into classes that any isomorphism has to
+# preserve. When the orderings consistent with those classes are few enough,
+# trying them all and keeping the smallest adjacency code gives an exact
+# canonical form. Otherwise the certificate is a hash of the refinement
+# itself (a Weisfeiler-Lehman hash), which isomorphic graphs share but others
+# may too, so a hit has to be confirmed with an isomorphism test against the
+# graph that was stored.
+#
+# Results are kept in a bounded in-memory LRU, and optionally in an sqlite
+# file that several processes can share.
+
+import hashlib
+import networkx as nx
+import sqlite3
+
+from collections import OrderedDict
+from itertools import permutations, product
+from math import factorial, prod
+
+from bitgraph import BitGraph, members, size
+
+# Largest number of orderings tried for an exact canonical form
+EXACT_LIMIT = 720
+
+# Most graphs kept under one hash certificate. Many non-isomorphic graphs
+# can share a hash (all k-regular graphs on n vertices do), and each one
+# kept costs an isomorphism test on every lookup under it.
+ENTRIES_PER_KEY = 16
+
+def colour_refinement(graph : BitGraph):
+    # The stable colouring reached from the degrees, with colours numbered
+    # in an isomorphism invariant way. Also returns a digest of every round
+    # of signatures, which isomorphic graphs share.
+
+    colours = [size(N) for N in graph.adj]
+    count = len(set(colours))
+
+    digest = hashlib.sha1(repr(sorted(colours)).encode())
+
+    while True:
+        signatures = [
+            (colours[v], tuple(sorted(colours[u] for u in members(graph.adj[v]))))
+            for v in range(graph.n)
+        ]
+
+        digest.update(repr(sorted(signatures)).encode())
+
+        palette = {sig : i for i, sig in enumerate(sorted(set(signatures)))}
+        colours = [palette[sig] for sig in signatures]
+
+        if len(palette) == count:
+            return colours, digest.hexdigest()
+
+        count = len(palette)
+
+def adjacency_code(graph : BitGraph, order):
+    # The upper triangle of the adjacency matrix in the given vertex order,
+    # read as one integer.
+
+    position = {v : i for i, v in enumerate(order)}
+    code = 0
+
+    for u, v in graph.edges():
+        i, j = sorted((position[u], position[v]))
+        code |= 1 << (i * graph.n + j)
+
+    return code
+
+def certificate(graph : BitGraph):
+    # Returns (certificate, exact). Computed once per graph.
+
+    if "certificate" in graph.memo:
+        return graph.memo["certificate"]
+
+    colours, digest = colour_refinement(graph)
+
+    cells = [
+        [v for v in range(graph.n) if colours[v] == c]
+        for c in range(max(colours, default=-1) + 1)
+    ]
+
+    if prod(factorial(len(cell)) for cell in cells) <= EXACT_LIMIT:
+        code = min(
+            adjacency_code(graph, [v for cell in order for v in cell])
+            for order in product(*(permutations(cell) for cell in cells))
+        )
+
+        result = ("c%d:%x" % (graph.n, code), True)
+
+    else:
+        result = ("w%d:%s" % (graph.n, digest), False)
+
+    graph.memo["certificate"] = result
+
+    return result
+
+def indexed_networkx(graph : BitGraph):
+    # The graph on the vertex indices rather than the labels.
+
+    H = nx.Graph(graph.edges())
+    H.add_nodes_from(range(graph.n))
+
+    return H
+
+def graph6(graph : BitGraph):
+    return nx.to_graph6_bytes(indexed_networkx(graph), header=False).strip().decode()
+
+class ResultCache():
+    # Maps certificates to lists of (graph6, result), where graph6 is the
+    # graph the result was computed for. With an exact certificate the list
+    # has a single entry and no confirmation is needed. At most maxsize
+    # entries are kept in memory in all, dropping the least recently used
+    # certificates, and at most ENTRIES_PER_KEY under one, dropping the
+    # oldest.
+
+    def __init__(self, maxsize=4096, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.entries = OrderedDict()
+        self.size = 0
+        self.db = None
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.isomorphism_tests = 0
+
+    def __getstate__(self):
+        # Connections can't be pickled; each process opens its own.
+        state = self.__dict__.copy()
+        state["db"] = None
+        return state
+
+    def connection(self):
+        if self.db is None:
+            self.db = sqlite3.connect(self.path, timeout=30)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "certificate TEXT, graph6 TEXT, berge INTEGER, "
+                "PRIMARY KEY (certificate, graph6))")
+            self.db.commit()
+
+        return self.db
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def stored(self, key):
+        # The entries for a certificate, from memory or else from disk.
+
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        if self.path is None:
+            return []
+
+        rows = self.connection().execute(
+            "SELECT graph6, berge FROM results WHERE certificate = ? ORDER BY rowid", (key,)).fetchall()
+
+        entries = [(g6, bool(berge)) for g6, berge in rows]
+
+        if entries:
+            self.disk_hits += 1
+            entries = self.remember(key, entries)
+
+        return entries
+
+    def remember(self, key, entries):
+        entries = entries[max(len(entries) - min(ENTRIES_PER_KEY, self.maxsize), 0):]
+
+        self.size += len(entries) - len(self.entries.get(key, []))
+        self.entries[key] = entries
+        self.entries.move_to_end(key)
+
+        while self.size > self.maxsize:
+            self.size -= len(self.entries.popitem(last=False)[1])
+
+        return entries
+
+    def get(self, graph : BitGraph):
+        # The cached result for a graph isomorphic to this one, or None.
+
+        key, exact = certificate(graph)
+        entries = self.stored(key)
+
+        if exact and entries:
+            self.hits += 1
+            return entries[0][1]
+
+        H = None
+
+        for g6, result in entries:
+            if H is None:
+                H = indexed_networkx(graph)
+
+            self.isomorphism_tests += 1
+
+            if nx.is_isomorphic(H, nx.from_graph6_bytes(g6.encode())):
+                self.hits += 1
+                return result
+
+        self.misses += 1
+        return None
+
+    def put(self, graph : BitGraph, result):
+        key, exact = certificate(graph)
+        entry = (graph6(graph), bool(result))
+
+        if exact:
+            self.remember(key, [entry])
+        else:
+            self.remember(key, self.entries.get(key, []) + [entry])
+
+        if self.path is not None:
+            db = self.connection()
+            db.execute("INSERT OR IGNORE INTO results VALUES (?, ?, ?)", (key, *entry))
+            db.commit()
+
+    def stats(self):
+        return {
+            "hits" : self.hits,
+            "misses" : self.misses,
+            "disk_hits" : self.disk_hits,
+            "isomorphism_tests" : self.isomorphism_tests,
+            "size" : self.size,
+        }
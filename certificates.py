@@ -0,0 +1,186 @@
+# Certificates that a graph is not Berge: an odd hole or an odd antihole, as
+# the sequence of its vertices in cyclic order, which anyone can check
+# against the graph in O(k^2) with verify_certificate.
+#
+# The detectors in berge.find_obstruction only show that one exists, so the
+# certificate is worked out from what they found:
+#
+# - a jewel v1, ..., v5 with its path P from v1 to v4 closes into a hole
+#   either through v2, v3 or through v5, and one of the two is odd,
+# - a pyramid has three paths from its apex to its triangle, and two of
+#   them have the same parity, so together with an edge of the triangle
+#   they make an odd hole,
+# - a near cleaner hit x1-x3-x2, y1 gives the odd hole x1-x3-x2 closed up by
+#   the paths R(x2, y1) and R(x1, y1),
+# - for T2 and T3 configurations, a shortest odd hole or antihole is
+#   searched for among the vertices of the configuration.
+#
+# If that fails, shortest odd holes are searched for in the graph and its
+# complement. Everything found is verified before it is returned.
+
+from functools import partial
+from multiprocessing import Pool
+
+from bitgraph import BitGraph, as_bitgraph, mask_of
+from jewel import jewel_path
+from near_cleaners import near_cleaner_hit
+from parallel import first_result
+from pyramid import pyramid_find_paths
+from two_join import check_hole, hole_starts
+
+def verify_certificate(graph, certificate):
+    # Checks that certificate is ("hole", vs) for an odd hole of the graph,
+    # or ("antihole", vs) for an odd antihole, with vs in cyclic order.
+
+    graph = as_bitgraph(graph)
+
+    try:
+        kind, vs = certificate
+    except (TypeError, ValueError):
+        return False
+
+    if kind not in ("hole", "antihole"):
+        return False
+
+    k = len(vs)
+
+    if k < 5 or k % 2 == 0 or len(set(vs)) != k:
+        return False
+
+    if any(v not in graph.index for v in vs):
+        return False
+
+    vs = [graph.from_label(v) for v in vs]
+
+    # Only consecutive vertices are adjacent in a hole, and only they aren't
+    # in an antihole.
+    for i in range(k):
+        for j in range(i + 1, k):
+            consecutive = j == i + 1 or (i == 0 and j == k - 1)
+
+            if graph.has_edge(vs[i], vs[j]) != (consecutive == (kind == "hole")):
+                return False
+
+    return True
+
+def shortest_odd_hole(graph : BitGraph, S=None, pool : Pool = None):
+    # A shortest odd hole of G|S, as a list of labels, or None. Holes are
+    # grown for each odd length in turn, so this is exponential in the
+    # worst case.
+
+    if S is not None and S != graph.full:
+        graph = graph.subgraph(S)
+
+    for k in range(5, graph.n + 1, 2):
+        hole = first_result(pool, partial(check_hole, k=k), graph, hole_starts(graph), chunksize=64)
+
+        if hole:
+            return graph.to_labels(hole)
+
+    return None
+
+def jewel_holes(graph : BitGraph, frame):
+    v1, v2, v3, v4, v5 = jewel = [graph.from_label(v) for v in frame]
+    P = jewel_path(graph, jewel)
+
+    if P is None:
+        # Not a frame of this graph; certificate_from falls back to search
+        return
+
+    # P runs from v1 to v4
+    yield [v1, v2, v3] + P[:0:-1]
+    yield [v1, v5] + P[:0:-1]
+
+def pyramid_holes(graph : BitGraph, frame):
+    apex, b0, b1, b2, s0, s1, s2, m0, m1, m2 = [graph.from_label(v) for v in frame]
+
+    b, s, m = [b0, b1, b2], [s0, s1, s2], [m0, m1, m2]
+    M = graph.full & ~mask_of(b + s)
+
+    # The path from s_i to b_i through m_i, as check_pyramid found it
+    paths = [pyramid_find_paths(graph, M, b, s, i).get(m[i]) for i in range(3)]
+
+    if None in paths:
+        # Not a frame of this graph; certificate_from falls back to search
+        return
+
+    for i in range(3):
+        for j in range(i + 1, 3):
+            if len(paths[i]) % 2 == len(paths[j]) % 2:
+                yield [apex] + paths[i] + paths[j][::-1]
+
+def near_cleaner_holes(graph : BitGraph, frame):
+    X = graph.from_labels(frame)
+    hit = near_cleaner_hit(X, graph)
+
+    if hit is None:
+        return
+
+    x1, x3, x2, y1 = hit
+    r, pred = graph.distance_tables(X)
+
+    def R(x, y):
+        path = [y]
+
+        while path[-1] != x:
+            path.append(int(pred[x, path[-1]]))
+
+        return path[::-1]
+
+    yield [x3] + R(x2, y1) + R(x1, y1)[-2::-1]
+
+def frame_vertices(graph : BitGraph, detector, frame):
+    # Every vertex in a frame. T2 and T3 frames end with the set X and the
+    # path P; a near cleaner frame is the near cleaner itself.
+
+    if detector in ("T2", "T3"):
+        *vs, X, P = frame
+        return graph.from_labels([*vs, *X, *P])
+
+    return graph.from_labels(list(frame))
+
+HOLE_EXTRACTORS = {
+    "jewel" : jewel_holes,
+    "pyramid" : pyramid_holes,
+    "near_cleaner" : near_cleaner_holes,
+}
+
+def certificate_from(graph : BitGraph, obstruction, pool : Pool = None):
+    # The certificate for an obstruction (detector, side, frame) returned by
+    # berge.find_obstruction on this graph. The frame should come from this
+    # graph itself rather than a larger one: the paths rebuilt from it are
+    # shortest ones, and extra vertices can change them. If they do, this
+    # falls back to searching for a hole.
+
+    detector, side, frame = obstruction
+
+    H = graph if side == "G" else graph.complement()
+    kinds = ("hole", "antihole") if side == "G" else ("antihole", "hole")
+
+    def certified(kind, labels):
+        certificate = (kind, tuple(labels))
+
+        if verify_certificate(graph, certificate):
+            return certificate
+
+        return None
+
+    if detector in HOLE_EXTRACTORS:
+        for hole in HOLE_EXTRACTORS[detector](H, frame):
+            found = certified(kinds[0], H.to_labels(hole))
+
+            if found:
+                return found
+
+    # Search among the vertices of the frame, and then everywhere
+    for S in (frame_vertices(H, detector, frame), H.full):
+        for kind, side_graph in zip(kinds, (H, H.complement())):
+            hole = shortest_odd_hole(side_graph, S, pool)
+
+            if hole:
+                found = certified(kind, hole)
+
+                if found:
+                    return found
+
+    return None
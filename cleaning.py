@@ -1,68 +1,110 @@
 # The cleaning algorithm, from section 9 of the paper
 
 import networkx as nx
+import sys
 
-from util import *
+import stats
+
+from bitgraph import BitGraph, bit, members, size
 
 from multiprocessing import Pool
 from functools import partial
 
-def cleaning(graph : nx.Graph):
-    # Takes a graph G and outputs am iterator of subsets of V(G) 
+def cleaning(graph : nx.Graph, lazy=False):
+    # Takes a graph G and outputs am iterator of subsets of V(G)
     # s.t. if G has an amenable shortest odd hole C, one of them
     # is a near-cleaner for C.
 
-    Gc = nx.complement(graph)
+    # Given a networkx graph the subsets are tuples of vertices, given a
+    # BitGraph they are masks. With lazy=True each new subset is yielded as
+    # soon as it is found instead of returning them all as a set, so the
+    # near-cleaner checks can start while enumeration carries on.
+
+    if isinstance(graph, nx.Graph):
+        G = BitGraph(graph)
+        cleaners = (tuple(G.to_labels(X)) for X in cleaning_stream(G))
+    else:
+        cleaners = cleaning_stream(graph)
+
+    if lazy:
+        return cleaners
+
+    return set(cleaners)
+
+def cleaning_stream(graph : BitGraph):
+    # Yields the distinct subsets from cleaning() one at a time, keeping the
+    # ones already yielded as a set of masks.
+
+    # Everything below depends on a, b and c only through a few tables,
+    # which are built once: the components of the complement, the
+    # anticomponents of C(a, b) for each non-adjacent pair, and the common
+    # neighbourhood of each edge.
+
+    full = graph.full
+    non_adj = [graph.non_neighbourhood(bit(v)) for v in range(graph.n)]
+
+    W = [0] * graph.n
+
+    for comp in graph.anticomponents(full):
+        for v in members(comp):
+            W[v] = comp
+
+    edge_commons = {graph.complete_verts(bit(u) | bit(v)) for (u, v) in graph.edges()}
+
+    # X(a, b, c) for every relevant triple. C(a, b) is symmetric in a and b,
+    # and many pairs share it, so each C is only handled once.
+
+    Xs = set()
+    seen = set()
+    seen_C = set()
+    Z = dict()
+
+    recorder = stats.active
+
+    for a in range(graph.n):
+        for b in members(non_adj[a] >> (a + 1) << (a + 1)):
+            C = graph.complete_verts(bit(a) | bit(b))
+
+            if C in seen_C:
+                continue
+
+            seen_C.add(C)
 
-    relevant = (
-        (a, b, c)
-        for a in vertex_set(graph)
-        for b in neighbourhood(Gc, a)
-        for c in vertex_set(graph) - complete_verts(graph, {a, b})
-    )
+            anticomps = [(X, size(X)) for X in graph.anticomponents(C)]
 
-    def R(a, b, c):
-        S = {
-            tuple(X) 
-            for X in anticomponents(graph, complete_verts(graph, (a, b))) if not set(X).isdisjoint( neighbourhood(Gc, c) ) 
-        }
+            for c in members(full & ~C):
+                # R(a, b, c)
+                r = max([k for X, k in anticomps if X & non_adj[c]], default=0)
 
-        if empty(S):
-            return 0
-        else:
-            return max( {len(X) for X in S} )
+                y = 0
 
-    def Y(a, b, c):
-        r = R(a, b, c)
+                for X, k in anticomps:
+                    if k > r:
+                        y |= X
 
-        return union([
-            set(X)
-            for X in anticomponents(graph, complete_verts(graph, (a, b)))
-            if len(X) > r
-        ])
+                w = W[c]
 
-    def W(a, b, c):
-        result = {c}
-        next_ = neighbourhood(Gc, c)
+                if (y, w) not in Z:
+                    Z[(y, w)] = graph.complete_verts(y | w)
 
-        while not empty(next_):
-            v = next_.pop()
-            result.add(v)
-            next_.update(neighbourhood(Gc, v) - result)
+                X = y | Z[(y, w)]
 
-        return result
+                if X in Xs:
+                    continue
 
-    cleaners = set()
+                Xs.add(X)
 
-    for (a, b, c) in relevant:
+                fresh = []
 
-        y = Y(a, b, c)
-        w = W(a, b, c)
+                for common in edge_commons:
+                    cleaner = common | X
 
-        Z = complete_verts(graph, y | w)
-        X = y | Z
+                    if cleaner not in seen:
+                        seen.add(cleaner)
+                        fresh.append(cleaner)
 
-        for (u, v) in edge_set(graph):
-            cleaners.add( tuple(complete_verts(graph, (u, v)) | X) )
+                if recorder is not None:
+                    recorder.peak("cleaners", count=len(seen),
+                        bytes=sys.getsizeof(seen) + len(seen) * sys.getsizeof(full))
 
-    return cleaners
\ No newline at end of file
+                yield from fresh
@@ -0,0 +1,161 @@
+# Checks a stream of graph6/sparse6 graphs, one per line, for example the
+# output of nauty's geng:
+#
+#   geng 10 | python cli.py -j 8 > results.txt
+#   python cli.py graphs.g6 --witness
+#
+# Writes one line per graph, 1 if it is Berge and 0 if not, in input order.
+# With --witness a 0 is followed by the detector that fired, on which side
+# (G or complement), and what it found, as JSON. With --certificate it is
+# followed instead by an odd hole or antihole, which can be checked without
+# rerunning anything (see certificates.py). With --unordered lines come as
+# they complete, prefixed by the input line's number. Throughput goes to
+# stderr.
+#
+# A malformed line gets "? line N: <error>" in place of a result, so the
+# output still lines up with the input, and is reported on stderr too.
+#
+# Files are memory mapped and graphs are decoded as they are needed, with a
+# bounded number in flight, so memory stays flat whatever the input size.
+
+import argparse
+import collections
+import json
+import mmap
+import os
+import sys
+import time
+
+from berge import BergeRecognizer, SMALL_GRAPH_LIMIT, BATCH_WINDOW
+from graph6 import decode_lines
+
+def read_lines(path):
+    if path == "-":
+        yield from sys.stdin.buffer
+        return
+
+    with open(path, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            return
+
+        with mapped:
+            yield from iter(mapped.readline, b"")
+
+def as_json(witness):
+    return json.dumps(witness, default=sorted)
+
+def format_result(result, witness, certificate=False):
+    if not witness and not certificate:
+        return "1" if result else "0"
+
+    if result is None:
+        return "1"
+
+    if certificate:
+        kind, vs = result
+        return "0 %s %s" % (kind, as_json(vs))
+
+    detector, side, found = result
+
+    return "0 %s %s %s" % (detector, side, as_json(found))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check graph6/sparse6 graphs for being Berge.")
+
+    parser.add_argument("input", nargs="?", default="-", help="input file, or - for stdin (the default)")
+    parser.add_argument("-j", "--cores", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--witness", action="store_true", help="say what was found in each non-Berge graph")
+    parser.add_argument("--certificate", action="store_true", help="give an odd hole or antihole for each non-Berge graph")
+    parser.add_argument("--unordered", action="store_true", help="write results as they complete, with their index")
+    parser.add_argument("--threshold", type=int, default=SMALL_GRAPH_LIMIT,
+        help="graphs with at least this many vertices are split across the pool")
+    parser.add_argument("--window", type=int, default=BATCH_WINDOW, help="number of graphs in flight")
+    parser.add_argument("--progress", type=float, default=10, help="seconds between throughput reports")
+    parser.add_argument("--no-fast-path", action="store_true",
+        help="run the full algorithm even on graphs in the classes of fastpath.py")
+
+    args = parser.parse_args(argv)
+
+    out = sys.stdout
+
+    numbers = {}                    # graph index -> input line number
+    bad = collections.deque()       # (line number, error) not yet written
+
+    def malformed(number, error):
+        print("line %d: %s" % (number, error), file=sys.stderr, flush=True)
+        bad.append((number, error))
+
+    def graphs():
+        lines = decode_lines(read_lines(args.input), on_error=malformed, numbered=True)
+
+        for i, (number, graph) in enumerate(lines):
+            numbers[i] = number
+            yield graph
+
+    def write_malformed(before=None):
+        # Placeholders for the malformed lines before line number before,
+        # or for all of them so far.
+
+        while bad and (before is None or bad[0][0] < before):
+            number, error = bad.popleft()
+            placeholder = "? line %d: %s" % (number, error)
+
+            if args.unordered:
+                out.write("%d %s\n" % (number, placeholder))
+            else:
+                out.write(placeholder + "\n")
+
+    start = time.perf_counter()
+    last_report = start
+    count = 0
+
+    def report():
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed if elapsed > 0 else 0
+
+        print("%d graphs in %.1fs (%.1f graphs/s)" % (count, elapsed, rate), file=sys.stderr, flush=True)
+
+    with BergeRecognizer(args.cores, fast_path=not args.no_fast_path) as recogniser:
+        results = recogniser.is_berge_many(graphs(),
+            ordered=not args.unordered, threshold=args.threshold,
+            window=args.window, witness=args.witness, certificate=args.certificate)
+
+        for result in results:
+            if args.unordered:
+                i, result = result
+            else:
+                i = count
+
+            number = numbers.pop(i)
+
+            if args.unordered:
+                write_malformed()
+                out.write("%d %s\n" % (number, format_result(result, args.witness, args.certificate)))
+            else:
+                write_malformed(number)
+                out.write(format_result(result, args.witness, args.certificate) + "\n")
+
+            count += 1
+
+            now = time.perf_counter()
+
+            if now - last_report >= args.progress:
+                last_report = now
+                report()
+
+    write_malformed()
+
+    out.flush()
+    report()
+
+if __name__ == "__main__":
+    try:
+        main()
+    except BrokenPipeError:
+        # Whatever was reading our output has gone, e.g. head. Point stdout
+        # at /dev/null so the interpreter doesn't complain again on exit.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
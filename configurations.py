@@ -2,31 +2,31 @@
 
 import networkx as nx
 
-from util import *
+from bitgraph import BitGraph, as_bitgraph, bit, members, lowest
 
 from multiprocessing import Pool
-from functools import partial
+from parallel import first_result
 
-def check_config_T2(vs, graph : nx.Graph):
+def check_config_T2(vs, graph : BitGraph):
     # Algorithm 6.1
 
     v1, v2, v3, v4 = vs
 
-    if any({   
-            edge_exists(graph, *e)
+    if any({
+            graph.has_edge(*e)
             for e in {(v1, v3), (v1, v4), (v2, v4)}
         }):
         return None
 
-    Y = complete_verts(graph, {v1, v2, v4})
+    Y = graph.complete_verts(bit(v1) | bit(v2) | bit(v4))
 
-    for X in anticomponents(graph, Y):
+    for X in graph.anticomponents(Y):
 
-        U = (vertex_set(graph) - 
-        ({v2, v3} | neighbourhood(graph, v2) | neighbourhood(graph, v3)
-        | set(X) | complete_verts(graph, X)))
+        U = graph.full & ~(
+            bit(v2) | bit(v3) | graph.adj[v2] | graph.adj[v3]
+            | X | graph.complete_verts(X))
 
-        P = path_through(graph, U, v1, v4)
+        P = graph.path_through(U, v1, v4)
 
         if P:
             return (v1, v2, v3, v4, X, P)
@@ -34,72 +34,78 @@ def check_config_T2(vs, graph : nx.Graph):
     return None
 
 def find_config_T2(graph : nx.Graph, pool : Pool):
+    graph = as_bitgraph(graph)
 
-    check = partial(check_config_T2, graph=graph)
+    config = first_result(pool, check_config_T2, graph, graph.induced_paths(4), chunksize=4096)
 
-    for config in pool.imap_unordered(check, length_k_paths(graph, 4), chunksize=4096):
-        if config is not None:
-            return config
+    if config is not None:
+        *frame, X, P = config
+
+        return (*graph.to_labels(frame), set(graph.to_labels(X)), graph.to_labels(P))
 
     return None
 
-def check_config_T3(vs, graph : nx.Graph, return_config=True):
+def check_config_T3(vs, graph : BitGraph, return_config=True):
     #Algorithm 6.4
 
     v1, v2, v5 = vs
 
-    if (not edge_exists(graph, v1, v2) 
-        or edge_exists(graph, v1, v5) 
-        or edge_exists(graph, v2, v5)):
+    if (not graph.has_edge(v1, v2)
+        or graph.has_edge(v1, v5)
+        or graph.has_edge(v2, v5)):
         return None
 
-    Gc = nx.complement(graph)
-
-    Y = complete_verts(graph, {v1, v2, v5})
+    Y = graph.complete_verts(bit(v1) | bit(v2) | bit(v5))
 
-    for X in anticomponents(graph, Y):
-        X_complete_verts = complete_verts(graph, X)
+    for X in graph.anticomponents(Y):
+        X_complete_verts = graph.complete_verts(X)
 
-        F_prime = {v5}
-        next_ = neighbourhood(graph, v5)
-        seen = set()
+        F_prime = bit(v5)
+        next_ = graph.adj[v5]
+        seen = 0
 
-        while len(next_) != 0:
-            u = next_.pop()
-            seen.add(u)
+        while next_:
+            u = lowest(next_)
+            next_ ^= bit(u)
+            seen |= bit(u)
 
-            if not (u in X_complete_verts 
-                or edge_exists(graph, u, v1) 
-                or edge_exists(graph, u, v2)):
+            if not ((X_complete_verts >> u) & 1
+                or graph.has_edge(u, v1)
+                or graph.has_edge(u, v2)):
 
-                F_prime.add(u)
-                next_.update(neighbourhood(graph, u) - seen)
+                F_prime |= bit(u)
+                next_ |= graph.adj[u] & ~seen
 
-        F = F_prime | (X_complete_verts & neighbourhood(graph, F_prime) - neighbourhood(graph, {v1, v2, v5}))
+        F = F_prime | (X_complete_verts & graph.neighbourhood(F_prime)
+            & ~graph.neighbourhood(bit(v1) | bit(v2) | bit(v5)))
 
-        U = ( (neighbourhood(graph, v1) - neighbourhood(graph, {v2, v5})) 
-            & neighbourhood(graph, F) & neighbourhood(Gc, X) )
+        U = ( (graph.adj[v1] & ~graph.neighbourhood(bit(v2) | bit(v5)))
+            & graph.neighbourhood(F) & graph.non_neighbourhood(X) )
 
-        for v4 in U:
-            W = (complete_verts(graph, {v2, v4, v5}) & neighbourhood(Gc, X)) - neighbourhood(graph, v1)
+        for v4 in members(U):
+            W = (graph.complete_verts(bit(v2) | bit(v4) | bit(v5))
+                & graph.non_neighbourhood(X) & ~graph.adj[v1])
 
-            if len(W) != 0:
-                # We know there is a congifuration of type T3 in the graph. We 
+            if W:
+                # We know there is a congifuration of type T3 in the graph. We
                 # now just complete it and return it.
 
-                v3 = W.pop()
-                v6 = (neighbourhood(graph, v4) & F).pop()
+                v3 = lowest(W)
+                v6 = lowest(graph.adj[v4] & F)
 
-                P = path_through(graph, F_prime, v5, v6)
+                P = graph.path_through(F_prime, v5, v6)
 
                 return (v1, v2, v3, v4, v5, v6, X, P)
 
 
 def find_config_T3(graph : nx.Graph, pool : Pool):
-    check = partial(check_config_T3, graph=graph)
+    graph = as_bitgraph(graph)
+
+    config = first_result(pool, check_config_T3, graph, graph.vertex_combinations(3), chunksize=4096)
+
+    if config is not None:
+        *frame, X, P = config
 
-    for config in pool.imap_unordered(check, vertex_combinations(graph, 3), chunksize=4096):
-        if config is not None:
-            return config
+        return (*graph.to_labels(frame), set(graph.to_labels(X)), graph.to_labels(P))
 
     return None
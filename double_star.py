@@ -1,65 +1,68 @@
 import networkx as nx
+import numpy as np
 from util import *
+from bitgraph import BitGraph, UNREACHABLE, as_bitgraph, bit
+from parallel import first_result
 
 from multiprocessing import Pool
-from functools import partial
 
-def double_star_cutset_combinations(graph : nx.Graph):
-    Gc = nx.complement(graph)
+def component_of(graph : BitGraph, v):
+    comp = bit(v)
+    frontier = comp
 
-    for u, v in graph.edges:
-        for comp in nx.connected_components(graph):
-            for x, y in Gc.subgraph(comp).edges():
-                yield (u, v, x, y)
+    while frontier:
+        frontier = graph.neighbourhood(frontier) & ~comp
+        comp |= frontier
 
-def check_double_star_cutset(vs, graph : nx.Graph):
-    u, v, x, y = vs
+    return comp
 
-    S = (neighbourhood(graph, {u, v}) | {u, v})
+def check_double_star_cutset(vs, graph : BitGraph):
+    # S = N[{u, v}] separates two non-adjacent vertices x, y of the same
+    # component iff the component of u falls apart into two or more pieces
+    # once S is removed; other components are untouched by S. Vertices in
+    # different pieces are never adjacent.
 
-    if x in S or y in S:
-        return None
+    u, v = vs
 
-    if not nx.has_path(graph.subgraph(vertex_set(graph) - S), x, y):
+    S = graph.adj[u] | graph.adj[v] | bit(u) | bit(v)
+    rest = component_of(graph, u) & ~S
+
+    if rest and next(graph.components(rest)) != rest:
         return S
 
     return None
 
 def find_double_star_cutset(graph : nx.Graph, pool : Pool):
-    check = partial(check_double_star_cutset, graph=graph)
-
-    
-    if pool is not None:
-        for cutset in pool.imap_unordered(check, double_star_cutset_combinations(graph), chunksize=4096):
-            if cutset:
-                return cutset
+    graph = as_bitgraph(graph)
 
-    else:
-        for vs in double_star_cutset_combinations(graph):
-            cutset = check(vs)
+    cutset = first_result(pool, check_double_star_cutset, graph, graph.edges(), chunksize=256)
 
-            if cutset:
-                return cutset
+    if cutset:
+        return set(graph.to_labels(cutset))
 
     return None
 
+def has_long_path(dist, vs):
+    # Whether two of the vertices vs are at distance at least 4, that is,
+    # joined by a shortest path on more than 4 vertices.
+
+    D = dist[np.ix_(vs, vs)]
+
+    return bool(((D >= 4) & (D != UNREACHABLE)).any())
+
 def double_star_decomposition(graph : nx.Graph, pool : Pool):
-    
+
+    # Distances are measured in the whole graph, so every piece reads its
+    # pairs off the one matrix.
+    G = BitGraph(graph)
+    dist = G.distances()
+
     next_ = {graph}
 
     while not empty(next_):
         F = next_.pop()
 
-        flag = False
-
-        for u, v in vertex_combinations(F, 2):
-            path = shortest_path(graph, u, v)
-
-            if path and len(path) > 4:
-                flag = True
-                break
-
-        if not flag:
+        if not has_long_path(dist, [G.from_label(v) for v in F]):
             continue
 
         S = find_double_star_cutset(F, pool)
@@ -0,0 +1,175 @@
+# Keeping track of whether a graph is Berge while edges are added and
+# removed, without rerunning the whole algorithm after every change.
+#
+# Adding or removing the edge uv only changes the subgraphs induced on sets
+# containing both u and v, so any odd hole or antihole that appears has to
+# go through u and v. A Berge graph therefore stays Berge unless there is an
+# odd hole through u and v in the new graph or in its complement, and those
+# are searched for directly, growing induced paths out from u.
+#
+# A graph that wasn't Berge stays that way while its certificate (see
+# certificates.py) doesn't contain both u and v. Otherwise, and whenever
+# the local search runs past its budget, the full algorithm is run.
+
+import networkx as nx
+
+from multiprocessing import Pool
+
+from berge import BergeRecognizer
+from bitgraph import BitGraph, bit, members
+
+# Number of paths the local search may grow before giving up
+SEARCH_BUDGET = 20000
+
+class OutOfBudget(Exception):
+    pass
+
+def hole_through(graph : BitGraph, u, v, budget=SEARCH_BUDGET):
+    # An odd hole containing u and v, as a list of vertices starting at u, or
+    # None if there is none. Raises OutOfBudget if that can't be decided
+    # within the budget.
+    #
+    # Induced paths are grown from u as in two_join.grow_hole: interior is
+    # the union of the closed neighbourhoods of the path's inner vertices,
+    # which nothing added later may touch. Past the first step, a vertex
+    # seeing u ends the path.
+
+    adj = graph.adj
+    steps = 0
+
+    def grow(path, interior, seen_v):
+        nonlocal steps
+
+        steps += 1
+
+        if steps > budget:
+            raise OutOfBudget()
+
+        last = path[-1]
+
+        if len(path) == 1:
+            interior_next = interior
+        else:
+            interior_next = interior | adj[last] | bit(last)
+
+        for w in members(adj[last] & ~interior & ~bit(u)):
+            if len(path) > 1 and (adj[w] >> u) & 1:
+                # w closes the cycle, which has to be odd and at least a C5
+                if len(path) >= 4 and len(path) % 2 == 0 and (seen_v or w == v):
+                    return path + [w]
+
+                continue
+
+            if not seen_v and w != v and (interior_next >> v) & 1:
+                # v could no longer be added
+                continue
+
+            hole = grow(path + [w], interior_next, seen_v or w == v)
+
+            if hole:
+                return hole
+
+        return None
+
+    if (adj[u] >> v) & 1:
+        # u and v have to be consecutive on the hole
+        return grow([u, v], 0, True)
+
+    return grow([u], 0, False)
+
+class DynamicBergeChecker():
+    # Tracks whether a graph is Berge as edges are added and removed. The
+    # vertices are fixed when it is made. Full runs go through a
+    # BergeRecognizer, so use it as a context manager or call close() when
+    # done, as with that.
+
+    def __init__(self, graph : nx.Graph, n_cores=None, pool : Pool = None, budget=SEARCH_BUDGET):
+        self.graph = BitGraph(graph)
+        self.recogniser = BergeRecognizer(n_cores, pool)
+        self.budget = budget
+
+        self.local_updates = 0
+        self.full_runs = 0
+
+        self.berge = None
+        self.certificate = None
+
+        self.full_run()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.recogniser.close()
+
+    def full_run(self):
+        self.full_runs += 1
+
+        self.certificate = self.recogniser.find_certificate(self.graph)
+        self.berge = self.certificate is None
+
+        return self.berge
+
+    def is_berge(self):
+        return self.berge
+
+    def add_edge(self, u, v):
+        return self.update(u, v, True)
+
+    def remove_edge(self, u, v):
+        return self.update(u, v, False)
+
+    def update(self, u, v, edge):
+        # Makes uv an edge or a non-edge, and returns whether the graph is
+        # now Berge.
+
+        graph = self.graph
+        i, j = graph.from_label(u), graph.from_label(v)
+
+        if i == j:
+            raise ValueError("no loops allowed")
+
+        if graph.has_edge(i, j) == edge:
+            return self.berge
+
+        graph.adj[i] ^= bit(j)
+        graph.adj[j] ^= bit(i)
+
+        # Anything worked out from the old edges is stale now
+        graph.memo.clear()
+
+        if not self.berge and not {u, v} <= set(self.certificate[1]):
+            self.local_updates += 1
+            return False
+
+        try:
+            for kind, H in (("hole", graph), ("antihole", graph.complement())):
+                hole = hole_through(H, i, j, self.budget)
+
+                if hole:
+                    self.local_updates += 1
+
+                    self.berge = False
+                    self.certificate = (kind, tuple(graph.to_labels(hole)))
+
+                    return False
+
+        except OutOfBudget:
+            return self.full_run()
+
+        if self.berge:
+            self.local_updates += 1
+            return True
+
+        # The old certificate is gone, but some other odd hole or antihole
+        # may not go through u and v
+        return self.full_run()
+
+    def stats(self):
+        return {
+            "local_updates" : self.local_updates,
+            "full_runs" : self.full_runs,
+        }
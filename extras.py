@@ -3,6 +3,8 @@
 import networkx as nx
 
 from util import *
+from bitgraph import BitGraph, as_bitgraph, mask_of
+from parallel import first_result
 
 from multiprocessing import Pool
 from functools import partial
@@ -72,20 +74,20 @@ def is_near_cleaner_wasteful(X, graph : nx.Graph, pool : Pool):
 
     return False
 
+def check_hole_or_antihole(S, graph : BitGraph):
+    # G|S is an odd hole or antihole iff it or its complement is a cycle
+
+    S = mask_of(S)
+
+    return graph.is_cycle(S) or graph.complement().is_cycle(S)
+
 def is_berge_naive(graph : nx.Graph, pool : Pool):
-    subsets = it.chain.from_iterable(
-        ( it.combinations(graph.nodes, k) 
-        for k in range(5, len(graph.nodes), 2) )
-    )
+    graph = as_bitgraph(graph)
 
-    graphs = it.chain.from_iterable(
-        ( (graph.subgraph(S), nx.complement(graph.subgraph(S))) 
-          for S in subsets )
+    subsets = it.chain.from_iterable(
+        ( graph.vertex_combinations(k)
+        for k in range(5, graph.n, 2) )
     )
 
-    for hole_found in pool.imap_unordered(is_cycle, graphs, chunksize=4096):
-        if hole_found:
-            return False
-
-    return True
+    return not first_result(pool, check_hole_or_antihole, graph, subsets, chunksize=4096)
 
@@ -0,0 +1,97 @@
+# Recognising some classes of perfect graphs directly, so that graphs in them
+# skip the full algorithm. These are the families the tests are built from:
+#
+# - bipartite graphs, by 2-colouring,
+# - chordal graphs, by maximum cardinality search and a check that the
+#   order found is a perfect elimination ordering,
+# - line graphs of bipartite graphs, by recovering the root graph,
+#
+# and the complements of each.
+
+import networkx as nx
+
+from bitgraph import BitGraph, bit, members
+
+def maximum_cardinality_search(graph : BitGraph):
+    # Visits the vertices, each time picking one with the most visited
+    # neighbours. Returns them in the order visited.
+
+    weight = [0] * graph.n
+    unvisited = graph.full
+    order = []
+
+    while unvisited:
+        v = max(members(unvisited), key=weight.__getitem__)
+
+        order.append(v)
+        unvisited &= ~bit(v)
+
+        for u in members(graph.adj[v] & unvisited):
+            weight[u] += 1
+
+    return order
+
+def is_chordal(graph : BitGraph):
+    # A graph is chordal exactly when the reverse of a maximum cardinality
+    # search order is a perfect elimination ordering: the neighbours of each
+    # vertex visited before it form a clique. It is enough to check that
+    # they are all adjacent to the last of them visited (Tarjan and
+    # Yannakakis).
+
+    position = [0] * graph.n
+    visited = 0
+
+    for i, v in enumerate(maximum_cardinality_search(graph)):
+        earlier = graph.adj[v] & visited
+
+        if earlier:
+            u = max(members(earlier), key=position.__getitem__)
+
+            if earlier & ~bit(u) & ~graph.adj[u]:
+                return False
+
+        position[v] = i
+        visited |= bit(v)
+
+    return True
+
+def is_line_of_bipartite(graph : BitGraph):
+    # Checked one component at a time, as networkx recovers the root graph
+    # of connected graphs only. Apart from the triangle, whose roots are K3
+    # and K1,3, a connected line graph has a unique root, and networkx gives
+    # K1,3 for the triangle.
+
+    for S in graph.components(graph.full):
+        H = graph.subgraph(S).to_networkx()
+
+        try:
+            root = nx.inverse_line_graph(H)
+        except nx.NetworkXError:
+            return False
+
+        if not nx.is_bipartite(root):
+            return False
+
+    return True
+
+# The classes tried, cheapest first
+CLASSES = (
+    ("bipartite", BitGraph.is_bipartite),
+    ("chordal", is_chordal),
+    ("line_bipartite", is_line_of_bipartite),
+)
+
+def perfect_class(graph : BitGraph):
+    # The name of a class above containing the graph, prefixed with
+    # "complement_" for the complement of one, or None.
+
+    Gc = graph.complement()
+
+    for name, recognise in CLASSES:
+        if recognise(graph):
+            return name
+
+        if recognise(Gc):
+            return "complement_" + name
+
+    return None
@@ -0,0 +1,149 @@
+# Decoding graph6 and sparse6 (the formats written by nauty's geng) straight
+# into a BitGraph, without going through networkx.
+#
+# See https://users.cecs.anu.edu.au/~bdm/data/formats.txt
+
+from bitgraph import from_adjacency, members
+
+# Upper triangle positions of the graph6 bit vector, per n
+_pairs = {}
+
+def upper_triangle(n):
+    # The vertex pairs of an n vertex graph in graph6 order: by column, then
+    # by row.
+
+    if n not in _pairs:
+        _pairs[n] = [(i, j) for j in range(1, n) for i in range(j)]
+
+    return _pairs[n]
+
+def decode_size(data):
+    # Returns (n, the rest of data) for the N(n) prefix.
+
+    if data[0] != 126:
+        return data[0] - 63, data[1:]
+
+    if data[1] != 126:
+        digits, rest = data[1:4], data[4:]
+    else:
+        digits, rest = data[2:8], data[8:]
+
+    n = 0
+
+    for c in digits:
+        n = (n << 6) | (c - 63)
+
+    return n, rest
+
+def as_bits(data):
+    # The 6 bit groups of data as one integer, first group highest.
+
+    value = 0
+
+    for c in data:
+        if not 63 <= c <= 126:
+            raise ValueError("invalid character in graph6/sparse6 data")
+
+        value = (value << 6) | (c - 63)
+
+    return value
+
+def decode_graph6(data):
+    n, data = decode_size(data)
+    pairs = upper_triangle(n)
+
+    if len(data) != (len(pairs) + 5) // 6:
+        raise ValueError("graph6 data has the wrong length for %d vertices" % n)
+
+    bits = as_bits(data)
+    top = 6 * len(data) - 1
+
+    adj = [0] * n
+
+    for p in members(bits):
+        k = top - p
+
+        if k < len(pairs):
+            i, j = pairs[k]
+
+            adj[i] |= 1 << j
+            adj[j] |= 1 << i
+
+    return from_adjacency(adj)
+
+def decode_sparse6(data):
+    if data[:1] == b";":
+        raise ValueError("incremental sparse6 is not supported")
+
+    n, data = decode_size(data[1:])
+
+    k = 1
+    while 1 << k < n:
+        k += 1
+
+    bits = as_bits(data)
+    remaining = 6 * len(data)
+
+    adj = [0] * n
+    v = 0
+
+    # Pairs (b, x) of a 1 bit flag and a k bit vertex; an incomplete pair at
+    # the end is padding.
+    while remaining >= k + 1:
+        remaining -= 1
+        b = (bits >> remaining) & 1
+
+        remaining -= k
+        x = (bits >> remaining) & ((1 << k) - 1)
+
+        if b:
+            v += 1
+
+        if x >= n or v >= n:
+            break
+        elif x > v:
+            v = x
+        elif x != v:
+            adj[x] |= 1 << v
+            adj[v] |= 1 << x
+
+    return from_adjacency(adj)
+
+def decode(line):
+    # Decodes one line of graph6 or sparse6, as bytes. Raises ValueError if
+    # it is malformed.
+
+    line = line.strip()
+
+    if line.startswith(b">>"):
+        line = line[line.index(b"<<") + 2:]
+
+    try:
+        if line[:1] in (b":", b";"):
+            return decode_sparse6(line)
+
+        return decode_graph6(line)
+
+    except IndexError:
+        raise ValueError("graph6/sparse6 data is truncated")
+
+def decode_lines(lines, on_error=None, numbered=False):
+    # Yields the graphs in a stream of lines, skipping blank ones, or with
+    # numbered pairs (line number, graph). A malformed line raises
+    # ValueError, or with on_error is skipped after calling
+    # on_error(line number, error).
+
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+
+        try:
+            graph = decode(line)
+        except ValueError as error:
+            if on_error is None:
+                raise
+
+            on_error(number, error)
+            continue
+
+        yield (number, graph) if numbered else graph
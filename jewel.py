@@ -1,51 +1,74 @@
 import networkx as nx
 
-from util import *
+from bitgraph import BitGraph, as_bitgraph, bit, members
 
 from multiprocessing import Pool
-from functools import partial
+from parallel import first_result
 
-def check_jewel(vs, graph: nx.Graph):
+def jewel_F(graph : BitGraph, v2, v3, v5):
+    return graph.full & ~(graph.adj[v2] | graph.adj[v3] | graph.adj[v5])
+
+def check_jewel(vs, graph : BitGraph):
     # Algorithm 3.1
 
     v2, v3, v5 = vs
 
-    N_v2 = neighbourhood(graph, v2)
+    N_v2 = graph.adj[v2]
+
+    if not (N_v2 >> v3) & 1:
+        return None
+
+    N_v3 = graph.adj[v3]
+    N_v5 = graph.adj[v5]
+
+    X1 = N_v2 & N_v5 & ~N_v3
+    X2 = N_v3 & N_v5 & ~N_v2
 
-    if v3 not in N_v2:
+    if not X1 or not X2:
         return None
-    
-    N_v3 = neighbourhood(graph, v3)
-    N_v5 = neighbourhood(graph, v5)
 
-    F = vertex_set(graph) - (N_v2 | N_v3 | N_v5)
-    comps = components(graph, F)
+    F = jewel_F(graph, v2, v3, v5)
 
-    X1 = N_v2 & N_v5 - N_v3
-    X2 = N_v3 & N_v5 - N_v2
+    # Label the components of G|F once. touches[v] has bit k set when v has
+    # a neighbour in the k-th component, so whether v1 and v4 have
+    # neighbours in a common component is a single AND.
 
-    for v1 in X1:
-        for v4 in X2:
-            if v1 in graph.neighbors(v4):
-                continue
+    touches = {v : 0 for v in members(X1 | X2)}
 
-            N_v1 = neighbourhood(graph, v1)
-            N_v4 = neighbourhood(graph, v4)
-            
-            for comp in comps:
-                if not (N_v1.isdisjoint(comp) or N_v4.isdisjoint(comp)):
+    for k, comp in enumerate(graph.components(F)):
+        for v in members(X1 | X2):
+            if graph.adj[v] & comp:
+                touches[v] |= bit(k)
 
-                    P = path_through(graph, F, v1, v4)
+    for v1 in members(X1):
+        if not touches[v1]:
+            continue
 
-                    return (v1, v2, v3, v4, v5)
+        for v4 in members(X2 & ~graph.adj[v1]):
+            if touches[v1] & touches[v4]:
+                return (v1, v2, v3, v4, v5)
 
     return None
 
-def find_jewel(graph: nx.Graph, pool : Pool):
-    check = partial(check_jewel, graph=graph)
+def jewel_path(graph : BitGraph, jewel):
+    # The path from v1 to v4 with interior in F, completing the jewel.
+
+    v1, v2, v3, v4, v5 = jewel
+
+    return graph.path_through(jewel_F(graph, v2, v3, v5), v1, v4)
+
+def find_jewel(graph : nx.Graph, pool : Pool, return_path=False):
+    # Returns the jewel (v1, v2, v3, v4, v5), followed by the path P from v1
+    # to v4 if return_path is set.
+
+    graph = as_bitgraph(graph)
+
+    jewel = first_result(pool, check_jewel, graph, graph.vertex_combinations(3), chunksize=4096)
+
+    if not jewel:
+        return None
 
-    for jewel in pool.imap_unordered(check, vertex_combinations(graph, 3), chunksize=4096):
-        if jewel:
-            return jewel
+    if return_path:
+        return (*graph.to_labels(jewel), graph.to_labels(jewel_path(graph, jewel)))
 
-    return None
\ No newline at end of file
+    return tuple(graph.to_labels(jewel))
@@ -1,51 +1,74 @@
 import networkx as nx
+import numpy as np
 
-from util import *
+from bitgraph import BitGraph, UNREACHABLE, members
 
-def is_near_cleaner(X, graph : nx.Graph):
+# Number of 3-paths tested against every y1 at once
+BLOCK_SIZE = 4096
+
+def near_cleaner_paths(graph : BitGraph):
+    # The induced 3-paths x1-x3-x2 of the graph, in both orientations, as
+    # blocks of rows. These don't depend on X, so they are worked out once
+    # per graph.
+
+    if "near_cleaner_paths" not in graph.memo:
+        graph.memo["near_cleaner_paths"] = list(graph.induced_path_batches(3, batch_size=BLOCK_SIZE))
+
+    return graph.memo["near_cleaner_paths"]
+
+def is_near_cleaner(X, graph : BitGraph):
     # Algorithm 5.1
 
     # Takes a pyramid and jewel free graph, and a subset of its vertices X,
     # and returns True iff there is a shortest odd hole C s.t. X is a
     # near cleaner for C, false otherwise
 
-    X = set(X)
+    return near_cleaner_hit(X, graph) is not None
+
+def near_cleaner_hit(X, graph : BitGraph):
+    # As is_near_cleaner, but returns the vertices (x1, x3, x2, y1) that
+    # were found, or None. The odd hole is then x1-x3-x2 closed up by
+    # R(x2, y1) and R(x1, y1).
+
+    # X is either a mask over the vertices of a BitGraph, or a collection of
+    # vertices of a networkx graph.
+
+    if isinstance(graph, nx.Graph):
+        graph = BitGraph(graph)
+
+    X = graph.from_labels(X)
+
+    # r[x, y] is the length of a shortest path R(x, y) between x and y with
+    # no interior vertex in X, and R(x, y) ends with pred[x, y], y.
+    r, pred = graph.distance_tables(X)
 
-    inf = float("inf")
+    Y1 = np.zeros(graph.n, dtype=bool)
+    Y1[list(members(graph.full & ~X))] = True
 
-    R = dict()
-    r = dict()
+    # Rather than looping over y1, each block of paths x1-x3-x2 is tested
+    # against every y1 at once. Rows are paths and columns are choices of y1.
 
-    for x in vertex_set(graph):
-        for y in vertex_set(graph):
-            R[(x, y)] = shortest_path_without_interior_vertices(graph, x, y, X)
+    for block in near_cleaner_paths(graph):
+        x1, x3, x2 = block.T
+        rows = np.arange(len(block))
 
-            if R[(x, y)]:
-                r[(x, y)] = len(R[(x, y)])
-            else:
-                r[(x, y)] = inf
+        r1 = r[x1]
+        r2 = r[x2]
+        r3 = r[x3]
 
-    for y1 in vertex_set(graph) - X:
-        for x1, x3, x2 in length_k_paths(graph, 3):
-            
-            if y1 in (x1, x3, x2):
-                continue
+        valid = Y1 & (r1 != UNREACHABLE) & (r2 != UNREACHABLE)
+        valid[rows, x1] = False
+        valid[rows, x3] = False
+        valid[rows, x2] = False
 
-            if edge_exists(graph, x1, x2):
-                continue
-            
-            if r[(x1, y1)] == inf:
-                continue
+        y2 = np.where(valid, pred[x2], 0)
+        n = r[x1[:, None], y2]
 
-            if r[(x2, y1)] == inf:
-                continue
-            
-            y2 = R[(x2, y1)][-2]
-            n = r[(x1, y2)]
+        found = (valid & (r2 == r1+1) & (r1+1 == n)
+            & (r3 >= n) & (r[x3[:, None], y2] >= n))
 
-            if r[(x2, y1)] == r[(x1, y1)]+1 == n:
-                if r[(x3, y1)] >= n:
-                    if r[(x3, y2)] >= n:
-                        return True
+        if found.any():
+            i, y1 = np.argwhere(found)[0]
+            return (*map(int, block[i]), int(y1))
 
-    return False
+    return None
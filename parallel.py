@@ -0,0 +1,283 @@
+# Running the detectors on a pool of worker processes.
+#
+# Rather than pickling the graph into every chunk of every detector, its
+# adjacency is written once into a block of shared memory as packed uint64
+# words, one row per vertex. Tasks carry a small handle naming the block and
+# its generation along with their candidates. Each worker decodes a
+# generation the first time it sees it and keeps it for later chunks.
+#
+# The first bytes of the block are a header holding a cancellation flag.
+# Once a search has its answer the flag is set, the remaining candidates
+# are no longer handed to the pool, and workers drop the batches already
+# queued instead of checking them.
+#
+# Whole graphs handed to a worker in one task (see
+# berge.BergeRecognizer.is_berge_many) are cancelled in the same way through
+# a CancelFlag, a block holding just the header, which sequential searches
+# in the worker look at between candidates.
+
+import importlib
+import os
+import sys
+import time
+
+from contextlib import contextmanager
+from itertools import count, islice
+from functools import partial
+from multiprocessing import Pool, shared_memory, resource_tracker
+
+import stats
+
+from bitgraph import BitGraph, from_adjacency
+
+# Number of decoded graphs a worker keeps. is_berge alternates between a
+# graph and its complement, so this only needs to be small.
+WORKER_CACHE_SIZE = 8
+
+HEADER_BYTES = 8
+
+# Modules each worker imports when it starts
+WARM_MODULES = ("jewel", "pyramid", "configurations", "near_cleaners", "two_join", "double_star")
+
+_generations = count()
+
+# Worker side state, generation -> (BitGraph, SharedMemory)
+_worker_graphs = {}
+
+# Worker side, the CancelFlag block of the task being run, if any
+_watched = None
+
+def row_bytes(n):
+    return 8 * ((n + 63) // 64)
+
+class SharedGraph():
+    def __init__(self, graph : BitGraph):
+        self.graph = graph
+        self.generation = (os.getpid(), next(_generations))
+        self.shm = None
+        self.cancelled = False
+        self.dispatched = 0
+
+    def __enter__(self):
+        n = self.graph.n
+        width = row_bytes(n)
+
+        self.shm = shared_memory.SharedMemory(create=True, size=HEADER_BYTES + n * width)
+        self.shm.buf[:HEADER_BYTES] = bytes(HEADER_BYTES)
+
+        for v, mask in enumerate(self.graph.adj):
+            start = HEADER_BYTES + v * width
+            self.shm.buf[start : start + width] = mask.to_bytes(width, "little")
+
+        return self
+
+    def __exit__(self, *exc):
+        self.cancel()
+
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+
+    def cancel(self):
+        self.cancelled = True
+        self.shm.buf[0] = 1
+
+    @property
+    def handle(self):
+        return (self.shm.name, self.generation, self.graph.n)
+
+class Cancelled(Exception):
+    pass
+
+class CancelFlag():
+    def __enter__(self):
+        self.shm = shared_memory.SharedMemory(create=True, size=HEADER_BYTES)
+        self.shm.buf[:HEADER_BYTES] = bytes(HEADER_BYTES)
+
+        return self
+
+    def __exit__(self, *exc):
+        self.cancel()
+
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+
+    def cancel(self):
+        self.shm.buf[0] = 1
+
+    @property
+    def handle(self):
+        return self.shm.name
+
+def open_untracked(name):
+    # Attaching to a block registers it with the resource tracker of this
+    # process, which then tries to unlink it again when the worker exits
+    # (CPython issue 39959). Only the process that created a block owns it.
+
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+def attach(handle):
+    # Returns the graph behind a handle, decoding it on first use, along
+    # with the block so the cancellation flag can be read.
+
+    name, generation, n = handle
+
+    if generation in _worker_graphs:
+        return _worker_graphs[generation]
+
+    shm = open_untracked(name)
+    width = row_bytes(n)
+
+    graph = from_adjacency([
+        int.from_bytes(shm.buf[HEADER_BYTES + v * width : HEADER_BYTES + (v + 1) * width], "little")
+        for v in range(n)
+    ])
+
+    if len(_worker_graphs) >= WORKER_CACHE_SIZE:
+        oldest = next(iter(_worker_graphs))
+        _worker_graphs.pop(oldest)[1].close()
+
+    _worker_graphs[generation] = (graph, shm)
+
+    return graph, shm
+
+@contextmanager
+def watching(handle):
+    # Worker side: runs the block with cancelled() reading the flag behind
+    # handle. Raises Cancelled if it is already set.
+
+    global _watched
+
+    try:
+        shm = open_untracked(handle)
+    except FileNotFoundError:
+        # The flag is only released once it has been set
+        raise Cancelled()
+
+    try:
+        if shm.buf[0]:
+            raise Cancelled()
+
+        _watched = shm
+        yield
+    finally:
+        _watched = None
+        shm.close()
+
+def cancelled():
+    return _watched is not None and _watched.buf[0] != 0
+
+def init_worker():
+    # Pool initializer. Importing the detectors up front means the first
+    # search a fresh worker is given doesn't pay for it.
+
+    for name in WARM_MODULES:
+        importlib.import_module(name)
+
+def run_checks(batch, check, handle):
+    # Checks a batch of candidates, giving up as soon as the search is
+    # cancelled. Returns (result, number checked, seconds taken).
+
+    start = time.perf_counter()
+
+    try:
+        graph, shm = attach(handle)
+    except FileNotFoundError:
+        # The search this batch belongs to has already finished and
+        # released the graph.
+        return None, 0, 0.0
+
+    for i, vs in enumerate(batch):
+        if shm.buf[0]:
+            return None, i, time.perf_counter() - start
+
+        result = check(vs, graph)
+
+        if result:
+            return result, i + 1, time.perf_counter() - start
+
+    return None, len(batch), time.perf_counter() - start
+
+def batches(candidates, size, shared : SharedGraph):
+    # Groups the candidates into lists, stopping early once the search is
+    # cancelled. The pool consumes this in its own thread, so this is what
+    # keeps new work from being queued.
+
+    candidates = iter(candidates)
+
+    while not shared.cancelled:
+        batch = list(islice(candidates, size))
+
+        if not batch:
+            return
+
+        shared.dispatched += len(batch)
+
+        yield batch
+
+def first_result(pool : Pool, check, graph : BitGraph, candidates, chunksize=1):
+    # Runs check(vs, graph) over the candidates and returns the first truthy
+    # result, or None. Without a pool the candidates are checked in order,
+    # and in a worker watching a CancelFlag, Cancelled is raised once it is
+    # set.
+    # While stats are being recorded, the candidates and worker chunks are
+    # counted against the current phase.
+
+    recorder = stats.active
+
+    if pool is None:
+        checked = 0
+
+        for checked, vs in enumerate(candidates, 1):
+            if cancelled():
+                raise Cancelled()
+
+            result = check(vs, graph)
+
+            if result:
+                break
+        else:
+            result = None
+
+        if recorder is not None:
+            recorder.count("candidates", checked)
+            recorder.count("checked", checked)
+            recorder.count("rejected", checked - bool(result))
+            recorder.count("hits", bool(result))
+
+        return result
+
+    found = None
+    checked = 0
+
+    with SharedGraph(graph) as shared:
+        task = partial(run_checks, check=check, handle=shared.handle)
+
+        for result, n_checked, seconds in pool.imap_unordered(task, batches(candidates, chunksize, shared)):
+            checked += n_checked
+
+            if recorder is not None:
+                recorder.chunk(n_checked, seconds)
+
+            if result:
+                found = result
+                break
+
+    if recorder is not None:
+        recorder.count("candidates", shared.dispatched)
+        recorder.count("checked", checked)
+        recorder.count("rejected", checked - bool(found))
+        recorder.count("dropped", shared.dispatched - checked)
+        recorder.count("hits", bool(found))
+
+    return found
@@ -0,0 +1,65 @@
+# Splitting a graph into the pieces that need checking.
+#
+# Odd holes and odd antiholes are connected, and so are their complements,
+# so each one lies inside a single component of the graph and inside a
+# single anticomponent. A graph is therefore Berge exactly when all of its
+# components are, and exactly when all of its anticomponents are. Splitting
+# by one and then the other, recursively, leaves pieces which are both
+# connected and anticonnected, and only those need the full algorithm.
+#
+# Pieces on at most 4 vertices, cliques and edgeless pieces are Berge and
+# dropped; the smallest odd hole or antihole is C5.
+
+from bitgraph import BitGraph, bit, members, size
+
+# Pieces with at most this many vertices are Berge
+TRIVIAL_SIZE = 4
+
+def is_trivial(graph : BitGraph, S):
+    if size(S) <= TRIVIAL_SIZE:
+        return True
+
+    edgeless = True
+    clique = True
+
+    for v in members(S):
+        N = graph.adj[v] & S
+
+        edgeless = edgeless and N == 0
+        clique = clique and N == S & ~bit(v)
+
+        if not edgeless and not clique:
+            return False
+
+    return True
+
+def pieces(graph : BitGraph):
+    # Returns the masks of the pieces left to check, smallest first. A graph
+    # that doesn't split gives [graph.full], unless it is trivial.
+
+    found = []
+    stack = [graph.full]
+
+    while stack:
+        S = stack.pop()
+
+        if is_trivial(graph, S):
+            continue
+
+        parts = list(graph.components(S))
+
+        if len(parts) == 1:
+            parts = list(graph.anticomponents(S))
+
+        if len(parts) == 1:
+            found.append(S)
+        else:
+            stack.extend(parts)
+
+    return sorted(found, key=size)
+
+def piece_graphs(graph : BitGraph):
+    # The pieces as graphs, with the same labels. A graph that doesn't split
+    # is given back as is, keeping what it has memoised.
+
+    return [graph if S == graph.full else graph.subgraph(S) for S in pieces(graph)]
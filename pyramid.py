@@ -1,81 +1,134 @@
 import networkx as nx
 
 from multiprocessing import Pool
-from functools import partial
+from parallel import first_result
 
-from util import *
+from bitgraph import BitGraph, as_bitgraph, bit, members, mask_of, lowest
 
-def pyramid_combinations(graph : nx.Graph):
-    # TODO: This can be made better with some reasoning, want to allow
-    # s_i = b_i but not s_i = b_j, s_i = s_j or b_i = b_j
+def pyramid_combinations(graph : BitGraph):
+    # Yields the frames (b0, b1, b2, s0, s1, s2) which can start a pyramid,
+    # building them constraint first so hopeless ones never reach a worker:
+    #
+    # - b0 b1 b2 is a triangle,
+    # - s_i = b_i for at most one i, and s_i is never b_j or s_j,
+    # - the only edge between {b_i, s_i} and {b_j, s_j} is b_i b_j,
+    # - some apex outside the frame is adjacent to s0, s1 and s2 and to at
+    #   most one of b0, b1, b2.
+    #
+    # Permuting the indices of a frame gives the same pyramid, so only the
+    # ordering with b0 < b1 < b2 is produced.
 
-    for vs_1 in vertex_combinations(graph, 3):
-        for vs_2 in vertex_combinations(graph, 3):
-            yield vs_1 + vs_2
+    full = graph.full
+    adj = graph.adj
 
-def pyramid_find_paths(graph : nx.Graph, M, b, s, i):
-    P = {m : None for m in M | {b[i]} }
+    for b0 in range(graph.n):
+        for b1 in members(adj[b0] >> (b0 + 1) << (b0 + 1)):
+            for b2 in members(adj[b0] & (adj[b1] >> (b1 + 1) << (b1 + 1))):
+
+                B = bit(b0) | bit(b1) | bit(b2)
+
+                # Vertices with at most one neighbour in the triangle
+                apexes = full & ~B & ~(
+                    (adj[b0] & adj[b1]) | (adj[b0] & adj[b2]) | (adj[b1] & adj[b2]))
+
+                if not apexes:
+                    continue
+
+                # s_i != b_i must miss b_j and b_k
+                S0 = full & ~B & ~(adj[b1] | adj[b2])
+                S1 = full & ~B & ~(adj[b0] | adj[b2])
+                S2 = full & ~B & ~(adj[b0] | adj[b1])
+
+                for s0 in members((S0 | bit(b0)) & graph.neighbourhood(apexes)):
+                    A0 = apexes & adj[s0]
+
+                    T1 = S1 & ~bit(s0) & ~adj[s0]
+
+                    if s0 != b0:
+                        T1 |= bit(b1)
+
+                    for s1 in members(T1 & graph.neighbourhood(A0)):
+                        A1 = A0 & adj[s1]
+
+                        T2 = S2 & ~bit(s0) & ~bit(s1) & ~adj[s0] & ~adj[s1]
+
+                        if s0 != b0 and s1 != b1:
+                            T2 |= bit(b2)
+
+                        for s2 in members(T2 & graph.neighbourhood(A1)):
+                            yield (b0, b1, b2, s0, s1, s2)
+
+def pyramid_find_paths(graph : BitGraph, M, b, s, i):
+    P = {m : None for m in members(M | bit(b[i]))}
 
     if s[i] == b[i]:
         P[b[i]] = [b[i]]
         return P
 
-    if edge_exists(graph, s[i], b[i]):
+    if graph.has_edge(s[i], b[i]):
         # This check is not in the paper
 
         P[b[i]] = [s[i], b[i]]
         return P
 
-    excluded = b[:i] + b[(i+1):] + s[:i] + s[(i+1):]
+    excluded = mask_of(b[:i] + b[(i+1):] + s[:i] + s[(i+1):])
 
-    for m in M:
+    for m in members(M):
 
-        if adj_any(graph, m, excluded):
+        if graph.adj[m] & excluded:
             continue
 
-        S = shortest_path_without_interior_neighbours(graph, s[i], m, excluded)
+        S = graph.shortest_path_without_interior_neighbours(s[i], m, excluded)
 
         if not S:
             continue
 
-        T = shortest_path_without_interior_neighbours(graph, m, b[i], excluded)
+        T = graph.shortest_path_without_interior_neighbours(m, b[i], excluded)
 
         if not T:
             continue
 
-        if not set(S) & set(T) == {m}:
+        if not mask_of(S) & mask_of(T) == bit(m):
             continue
 
-        N = neighbourhood(graph, S[:-1])
+        N = graph.neighbourhood(mask_of(S[:-1]))
 
-        if not N.isdisjoint(T[1:]):
+        if N & mask_of(T[1:]):
             continue
 
         P[m] = S + T[1:]
 
     return P
 
-def pyramid_good_pairs(graph : nx.Graph, P, M, b, i, j):
+def pyramid_good_pairs(graph : BitGraph, P, M, b, i, j):
+    # Returns the good pairs (m_i, m_j) as an index, mapping each m_i to the
+    # mask of the m_j it pairs with.
+
+    paths_j = [
+        (m_j, mask_of(P[j][m_j]))
+        for m_j in members(M | bit(b[j]))
+        if P[j][m_j]
+    ]
 
-    good = []
+    good = {}
 
-    for m_i in M | {b[i]}:
+    for m_i in members(M | bit(b[i])):
         if not(P[i][m_i]):
             continue
 
-        excluded = M & (set(P[i][m_i]) | neighbourhood(graph, P[i][m_i]))
+        path = mask_of(P[i][m_i])
+        excluded = M & (path | graph.neighbourhood(path))
 
-        for m_j in M | {b[j]}:
-            if not(P[j][m_j]):
-                continue
+        good[m_i] = 0
 
-            if excluded.isdisjoint(P[j][m_j]):
-                good.append((m_i, m_j))
+        for m_j, path_j in paths_j:
+            if not excluded & path_j:
+                good[m_i] |= bit(m_j)
 
     return good
 
 
-def check_pyramid(vs, graph : nx.Graph):
+def check_pyramid(vs, graph : BitGraph):
     # Algorithm 2.2
 
     b = list(vs[:3])
@@ -96,59 +149,69 @@ def check_pyramid(vs, graph : nx.Graph):
         b = tuple([overlap_v] + b)
         s = tuple([overlap_v] + s)
 
-    N_s = [neighbourhood(graph, s[i]) for i in range(3)]
+    N_s = [graph.adj[s[i]] for i in range(3)]
 
     for j in range(0, 3):
         for i in range(0, j):
 
-            if not(edge_exists(graph, b[i], b[j])):
+            if not(graph.has_edge(b[i], b[j])):
                 return None
 
-            edges = edges_between(graph, [b[i], s[i]], [b[j], s[j]])
+            edges = graph.edges_between({b[i], s[i]}, {b[j], s[j]})
 
             if len(edges) > 1:
                 return None
 
     apex = None
 
-    for v in set.intersection(*N_s):
-        if sum([edge_exists(graph, v, b[i]) for i in range(3)]) <= 1:
+    for v in members(N_s[0] & N_s[1] & N_s[2]):
+        if sum([graph.has_edge(v, b[i]) for i in range(3)]) <= 1:
             apex = v
 
     if apex is None:
         return None
 
-    M = vertex_set(graph) - set(b + s)
+    M = graph.full & ~mask_of(b + s)
 
     P = [{}, {}, {}]
 
     P[0] = pyramid_find_paths(graph, M, b, s, 0)
     P[1] = pyramid_find_paths(graph, M, b, s, 1)
     P[2] = pyramid_find_paths(graph, M, b, s, 2)
-        
-    good_pairs = [[], [], []]
+
+    good_pairs = [{}, {}, {}]
 
     good_pairs[0] = pyramid_good_pairs(graph, P, M, b, 0, 1)
     good_pairs[1] = pyramid_good_pairs(graph, P, M, b, 0, 2)
     good_pairs[2] = pyramid_good_pairs(graph, P, M, b, 1, 2)
 
-    for m0 in M | {b[0]}:
-        for m1 in M | {b[1]}:
-            for m2 in M | {b[2]}:
-                if ((m0, m1) in good_pairs[0] and
-                    (m0, m2) in good_pairs[1] and
-                    (m1, m2) in good_pairs[2]):
-                    
-                    # We just found an optimal pyramid, return its frame
-                    return (apex, b[0], b[1], b[2], s[0], s[1], s[2], m0, m1, m2)
+    triangle = pyramid_triangle(good_pairs, M, b)
+
+    if triangle:
+        # We just found an optimal pyramid, return its frame
+        return (apex, b[0], b[1], b[2], s[0], s[1], s[2], *triangle)
+
+    return None
+
+def pyramid_triangle(good_pairs, M, b):
+    # The first triangle (m0, m1, m2) of good pairs, in lexicographic order,
+    # found by joining on the index rather than testing every triple.
+
+    for m0 in members(M | bit(b[0])):
+        for m1 in members(good_pairs[0].get(m0, 0)):
+            m2s = good_pairs[1].get(m0, 0) & good_pairs[2].get(m1, 0)
+
+            if m2s:
+                return (m0, m1, lowest(m2s))
 
     return None
 
 def find_pyramid(graph : nx.Graph, pool : Pool):
-    check = partial(check_pyramid, graph=graph)
+    graph = as_bitgraph(graph)
 
-    for pyramid in pool.imap_unordered(check, pyramid_combinations(graph), chunksize=4096):
-        if pyramid:
-            return pyramid
+    pyramid = first_result(pool, check_pyramid, graph, pyramid_combinations(graph), chunksize=4096)
 
-    return None
\ No newline at end of file
+    if pyramid:
+        return tuple(graph.to_labels(pyramid))
+
+    return None
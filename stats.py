@@ -0,0 +1,131 @@
+# Opt-in instrumentation for the recogniser.
+#
+# A Stats object collects, for one run:
+#
+# - wall and CPU time per phase, phases nesting as "near_cleaners/G" etc.
+#   CPU time is this process's; worker time shows up under workers,
+# - per phase counters: candidates handed out by first_result, how many were
+#   checked, rejected or dropped once the search was cancelled, and hits,
+# - per phase worker throughput: chunks, candidates checked and the time
+#   workers spent on them,
+# - peaks, such as the number and size of the cleaner sets,
+# - which detector found the obstruction, and on which side,
+# - how many pieces the fast path passed, per class (see fastpath.py).
+#
+# Recording is switched on by making a Stats the active one. The hot paths
+# only look at the module global below, so when nothing is recording they
+# pay for one attribute lookup per search.
+
+import json
+import sys
+import time
+
+from contextlib import contextmanager, nullcontext
+
+# The Stats being recorded into, or None
+active = None
+
+class Stats():
+    def __init__(self):
+        self.phases = {}      # phase -> {"wall", "cpu", "calls"}
+        self.counters = {}    # phase -> {counter -> int}
+        self.workers = {}     # phase -> {"chunks", "candidates", "seconds"}
+        self.peaks = {}       # name -> {quantity -> max}
+        self.found = None
+        self.classes = {}     # class -> pieces recognised as in it
+        self.stack = []
+
+    @property
+    def current(self):
+        return "/".join(self.stack) or "other"
+
+    @contextmanager
+    def phase(self, name):
+        self.stack.append(name)
+        path = self.current
+
+        wall = time.perf_counter()
+        cpu = time.process_time()
+
+        try:
+            yield
+        finally:
+            entry = self.phases.setdefault(path, {"wall" : 0.0, "cpu" : 0.0, "calls" : 0})
+
+            entry["wall"] += time.perf_counter() - wall
+            entry["cpu"] += time.process_time() - cpu
+            entry["calls"] += 1
+
+            self.stack.pop()
+
+    def count(self, name, k=1):
+        counters = self.counters.setdefault(self.current, {})
+        counters[name] = counters.get(name, 0) + k
+
+    def chunk(self, candidates, seconds):
+        # A chunk of candidates checked by a worker in the given time.
+
+        entry = self.workers.setdefault(self.current, {"chunks" : 0, "candidates" : 0, "seconds" : 0.0})
+
+        entry["chunks"] += 1
+        entry["candidates"] += candidates
+        entry["seconds"] += seconds
+
+    def peak(self, name, **quantities):
+        entry = self.peaks.setdefault(name, {})
+
+        for quantity, value in quantities.items():
+            entry[quantity] = max(entry.get(quantity, value), value)
+
+    def to_dict(self):
+        workers = {
+            phase : dict(entry,
+                throughput=entry["candidates"] / entry["seconds"] if entry["seconds"] else None)
+            for phase, entry in self.workers.items()
+        }
+
+        return {
+            "phases" : self.phases,
+            "counters" : self.counters,
+            "workers" : workers,
+            "peaks" : self.peaks,
+            "found" : self.found,
+            "classes" : self.classes,
+        }
+
+    def write(self, file=sys.stderr, **extra):
+        # Writes the stats as one line of JSON, along with any extra fields.
+
+        file.write(json.dumps(dict(extra, **self.to_dict()), default=str) + "\n")
+        file.flush()
+
+@contextmanager
+def recording(stats : Stats):
+    global active
+
+    previous = active
+    active = stats
+
+    try:
+        yield stats
+    finally:
+        active = previous
+
+def phase(name):
+    # Times the block as a phase of the active Stats, if there is one.
+
+    if active is None:
+        return nullcontext()
+
+    return active.phase(name)
+
+def note_found(detector, side):
+    if active is not None:
+        active.found = {"detector" : detector, "side" : side}
+
+def note_class(name):
+    if active is not None:
+        active.classes[name] = active.classes.get(name, 0) + 1
+
+def is_recording():
+    return active is not None
@@ -7,11 +7,112 @@ from util import *
 from multiprocessing import Pool
 import random
 import sys
+import time
 
 def test_random_chordal():
     for i in range(1, 100):
         assert(nx.is_chordal(random_chordal(i, p=random.random())))
 
+def test_bitgraph():
+
+    from bitgraph import BitGraph, UNREACHABLE
+
+    for i in range(20):
+        graph = nx.fast_gnp_random_graph(12, random.random())
+        G = BitGraph(graph)
+
+        for v in graph.nodes:
+            assert(set(G.to_labels(G.adj[G.from_label(v)])) == neighbourhood(graph, v))
+
+        S = set(random.sample(list(graph.nodes), 5))
+        mask = G.from_labels(S)
+
+        assert(set(G.to_labels(G.neighbourhood(mask))) == neighbourhood(graph, S))
+        assert(set(G.to_labels(G.complete_verts(mask))) == complete_verts(graph, S))
+
+        assert(sorted(sorted(G.to_labels(X)) for X in G.components(mask)) ==
+               sorted(sorted(X) for X in components(graph, S)))
+
+        assert(sorted(sorted(G.to_labels(X)) for X in G.anticomponents(mask)) ==
+               sorted(sorted(X) for X in anticomponents(graph, S)))
+
+        H = graph.subgraph(S)
+        assert(G.is_path(mask) == (nx.is_tree(H) and max(d for _, d in H.degree) <= 2))
+
+        u, v = random.sample(list(graph.nodes), 2)
+        P = path_through(graph, S, u, v)
+        Q = G.path_through(mask, G.from_label(u), G.from_label(v))
+
+        if P is None:
+            assert(Q is None)
+        else:
+            assert(len(Q) == len(P))
+            assert(nx.is_simple_path(graph, G.to_labels(Q)))
+
+        # Induced paths on k vertices, against the recursive enumerator
+        for k in range(1, 5):
+            paths = {
+                tuple(G.from_label(v) for v in path)
+                for path in length_k_paths(graph, k)
+                if nx.is_simple_path(graph, path) and
+                   graph.subgraph(path).number_of_edges() == k - 1
+            }
+
+            assert(sorted(G.induced_paths(k)) == sorted(paths))
+            assert(set(G.induced_paths(k, reverse=False)) ==
+                   {P for P in paths if P[0] <= P[-1]})
+
+            batches = list(G.induced_path_batches(k, batch_size=7))
+            assert(sum(len(batch) for batch in batches) == len(paths))
+
+        # Distances where interior vertices must avoid S
+        dist, pred = G.distance_tables(mask)
+
+        for x in graph.nodes:
+            for y in graph.nodes:
+                i, j = G.from_label(x), G.from_label(y)
+                P = shortest_path(graph.subgraph(vertex_set(graph) - S | {x, y}), x, y)
+
+                if P is None:
+                    assert(dist[i, j] == UNREACHABLE)
+                else:
+                    assert(dist[i, j] == len(P) - 1)
+
+                    if x != y:
+                        assert(G.has_edge(pred[i, j], j))
+                        assert(dist[i, pred[i, j]] == dist[i, j] - 1)
+
+def shared_adjacency(vs, graph):
+    return (graph.adj,)
+
+def slow_unless_first(vs, graph):
+    if vs == 0:
+        return vs + 1
+
+    time.sleep(.01)
+
+def test_shared_graph(pool : Pool):
+
+    from bitgraph import BitGraph
+    from parallel import SharedGraph, run_checks, first_result
+
+    for n in (0, 1, 63, 64, 65, 130):
+        G = BitGraph(nx.fast_gnp_random_graph(n, .3))
+
+        with SharedGraph(G) as shared:
+            for (adj,), checked, seconds in pool.starmap(run_checks, [([()], shared_adjacency, shared.handle)] * 4):
+                assert(adj == G.adj)
+
+    # Once the first result is in, the queued batches should be dropped
+    # rather than taking 40 seconds to work through.
+
+    start = time.time()
+
+    assert(first_result(pool, slow_unless_first, G, range(4000), chunksize=10) == 1)
+    assert(pool.apply(abs, (-1,)) == 1)
+
+    assert(time.time() - start < 10)
+
 def test_find_jewel(pool : Pool):
 
     from jewel import find_jewel
@@ -30,6 +131,25 @@ def test_find_jewel(pool : Pool):
 
     assert(find_jewel(nx.house_graph(), pool) is None)
 
+    for i in range(20):
+        graph = nx.fast_gnp_random_graph(10, random.random())
+        jewel = find_jewel(graph, pool, return_path=True)
+
+        if jewel is None:
+            continue
+
+        # v1, ..., v5 is a cycle with non-edges v1v3, v2v4, v1v4, and P
+        # avoids the neighbours of v2, v3 and v5.
+
+        *vs, P = jewel
+        v1, v2, v3, v4, v5 = vs
+
+        assert(all(graph.has_edge(vs[j], vs[(j+1) % 5]) for j in range(5)))
+        assert(not any(graph.has_edge(*e) for e in ((v1, v3), (v2, v4), (v1, v4))))
+
+        assert(P[0] == v1 and P[-1] == v4 and nx.is_simple_path(graph, P))
+        assert(neighbourhood(graph, {v2, v3, v5}).isdisjoint(P[1:-1]))
+
 def test_find_pyramid(pool : Pool):
 
     from pyramid import find_pyramid
@@ -81,6 +201,150 @@ def test_find_pyramid(pool : Pool):
 
     assert(find_pyramid(graph, pool)[:7] == (0, 4, 3, 6, 4, 1, 5))
 
+def test_pyramid_good_pairs():
+
+    from pyramid import pyramid_combinations, pyramid_find_paths, pyramid_good_pairs, pyramid_triangle
+    from bitgraph import BitGraph, bit, mask_of, members
+
+    # The good pair index and the join over it against the definitions:
+    # (m_i, m_j) is good when the path through m_j misses the path through
+    # m_i and its neighbours in M, and the triangle is the first triple
+    # that is good pairwise.
+
+    found = 0
+
+    for trial in range(20):
+        G = BitGraph(nx.fast_gnp_random_graph(12, random.uniform(.25, .45)))
+
+        for vs in pyramid_combinations(G):
+            b, s = list(vs[:3]), list(vs[3:])
+            M = G.full & ~mask_of(b + s)
+
+            P = [pyramid_find_paths(G, M, b, s, k) for k in range(3)]
+
+            pairs = []
+            index = []
+
+            for i, j in ((0, 1), (0, 2), (1, 2)):
+                good = set()
+
+                for m_i in members(M | bit(b[i])):
+                    for m_j in members(M | bit(b[j])):
+                        if not P[i][m_i] or not P[j][m_j]:
+                            continue
+
+                        path = mask_of(P[i][m_i])
+
+                        if not M & (path | G.neighbourhood(path)) & mask_of(P[j][m_j]):
+                            good.add((m_i, m_j))
+
+                pairs.append(good)
+                index.append(pyramid_good_pairs(G, P, M, b, i, j))
+
+                assert(good == {(m_i, m_j) for m_i, mask in index[-1].items() for m_j in members(mask)})
+
+            triangle = next((
+                (m0, m1, m2)
+                for m0 in members(M | bit(b[0]))
+                for m1 in members(M | bit(b[1]))
+                for m2 in members(M | bit(b[2]))
+                if (m0, m1) in pairs[0] and (m0, m2) in pairs[1] and (m1, m2) in pairs[2]
+            ), None)
+
+            assert(pyramid_triangle(index, M, b) == triangle)
+
+            found += triangle is not None
+
+    assert(found > 0)
+
+def test_pyramid_combinations():
+
+    from pyramid import pyramid_combinations, check_pyramid
+    from bitgraph import BitGraph
+    from itertools import product
+
+    # Every frame check_pyramid accepts should come from some generated
+    # candidate. check_pyramid pairs up an overlap s_i = b_j itself, so the
+    # frames are compared rather than the candidates.
+
+    for i in range(10):
+        G = BitGraph(nx.fast_gnp_random_graph(8, random.random()))
+
+        frames = {check_pyramid(vs, G) for vs in pyramid_combinations(G)}
+
+        for b in G.vertex_combinations(3):
+            for s in product(range(G.n), repeat=3):
+                frame = check_pyramid(b + s, G)
+
+                if frame is not None:
+                    assert(frame in frames)
+
+def test_cleaning():
+
+    from cleaning import cleaning
+
+    for i in range(10):
+        graph = nx.fast_gnp_random_graph(12, random.random())
+
+        stream = list(cleaning(graph, lazy=True))
+
+        assert(len(stream) == len(set(stream)))
+        assert(set(stream) == cleaning(graph))
+
+def test_cleaning_tables():
+
+    from cleaning import cleaning, cleaning_stream
+    from bitgraph import BitGraph, bit, members, size
+    from stats import Stats, recording
+
+    # cleaning works from tables built once per graph; this is the
+    # definition it replaced, recomputed for every triple (a, b, c).
+
+    def reference(G):
+        cleaners = set()
+
+        for a in range(G.n):
+            for b in members(G.non_neighbourhood(bit(a))):
+                C = G.complete_verts(bit(a) | bit(b))
+
+                for c in members(G.full & ~C):
+                    anticomponents = list(G.anticomponents(C))
+
+                    r = max((size(X) for X in anticomponents if X & G.non_neighbourhood(bit(c))), default=0)
+                    y = 0
+
+                    for X in anticomponents:
+                        if size(X) > r:
+                            y |= X
+
+                    # The component of c in the complement
+                    w = bit(c)
+                    frontier = G.non_neighbourhood(w)
+
+                    while frontier:
+                        w |= frontier
+                        frontier = G.non_neighbourhood(frontier) & ~w
+
+                    X = y | G.complete_verts(y | w)
+
+                    for u, v in G.edges():
+                        cleaners.add(G.complete_verts(bit(u) | bit(v)) | X)
+
+        return cleaners
+
+    for i in range(10):
+        G = BitGraph(nx.fast_gnp_random_graph(random.randint(5, 11), random.random()))
+
+        assert(set(cleaning(G)) == reference(G))
+
+    # The peak counts every cleaner kept, including the last ones added
+    G = BitGraph(nx.cycle_graph(8))
+
+    with recording(Stats()) as recorded:
+        cleaners = list(cleaning_stream(G))
+
+    assert(recorded.peaks["cleaners"]["count"] == len(cleaners))
+
 def test_near_cleaners(pool : Pool):
 
     from near_cleaners import is_near_cleaner
@@ -97,6 +361,38 @@ def test_near_cleaners(pool : Pool):
             if (b):
                 assert(a)
 
+def test_near_cleaner_tables():
+
+    from bitgraph import BitGraph, UNREACHABLE
+    from certificates import near_cleaner_holes, verify_certificate
+    from near_cleaners import near_cleaner_hit
+
+    # A C7 with a shortcut from 1 to 4 through 7, and 8 hanging off 7. With
+    # X = {7} the paths R(x, y) can't go through 7, so they are longer than
+    # the shortest paths of the graph, or missing.
+    graph = nx.cycle_graph(7)
+    graph.add_edges_from([(7, 1), (7, 4), (8, 7)])
+
+    G = BitGraph(graph)
+    X = G.from_labels([7])
+
+    r, pred = G.distance_tables(X)
+    D = G.distances()
+
+    assert(D[1, 4] == 2 and r[1, 4] == 3)
+    assert(D[1, 8] == 2 and r[1, 8] == UNREACHABLE)
+
+    # The hit found with these paths closes into an odd hole avoiding X
+    assert(near_cleaner_hit(X, G) is not None)
+
+    holes = list(near_cleaner_holes(G, [7]))
+
+    assert(holes)
+
+    for hole in holes:
+        assert(7 not in hole)
+        assert(verify_certificate(G, ("hole", tuple(G.to_labels(hole)))))
+
 def test_config_T2(pool : Pool):
 
     from configurations import find_config_T2
@@ -151,12 +447,532 @@ def test_config_T3(pool : Pool):
         assert(find_config_T3(graph, pool) is None)
         assert(find_config_T3(nx.complement(graph), pool) is None)
 
+def test_short_holes(pool : Pool):
+
+    from two_join import find_5_hole, find_7_hole
+
+    def brute_force(graph, k):
+        return any(is_cycle(graph.subgraph(S)) for S in combinations(graph, k))
+
+    for i in range(100):
+        graph = nx.gnp_random_graph(random.randint(5, 10), random.random() * .6)
+
+        for k, find in ((5, find_5_hole), (7, find_7_hole)):
+            hole = find(graph, None)
+
+            assert((hole is not None) == brute_force(graph, k))
+
+            if hole:
+                assert(len(hole) == k and is_cycle(graph.subgraph(hole)))
+                assert(all(graph.has_edge(hole[i - 1], hole[i]) for i in range(k)))
+
+    for n in range(4, 12):
+        graph = nx.cycle_graph(n)
+
+        assert((find_5_hole(graph, pool) is not None) == (n == 5))
+        assert((find_7_hole(graph, pool) is not None) == (n == 7))
+
+def test_find_2_join(pool : Pool):
+
+    from two_join import find_2_join
+
+    # Two copies of a path with a pendant vertex at one end, joined
+    # completely between the A sides and between the B sides
+    graph = nx.Graph([
+        ("x1", "m"), ("x2", "m"), ("m", "y"),
+        ("p1", "r"), ("p2", "r"), ("r", "q"),
+        ("x1", "p1"), ("x1", "p2"), ("x2", "p1"), ("x2", "p2"), ("y", "q")
+    ])
+
+    for p in (pool, None):
+        join = find_2_join(graph, p)
+
+        assert(join is not None)
+        assert(join.V1 | join.V2 == vertex_set(graph) and not join.V1 & join.V2)
+
+        crossing = {
+            frozenset((u, v)) for u, v in graph.edges
+            if (u in join.V1) != (v in join.V1)
+        }
+
+        assert(crossing == {
+            frozenset((u, v))
+            for X, Y in ((join.A1, join.A2), (join.B1, join.B2))
+            for u in X for v in Y
+        })
+
+    for i in range(50):
+        graph = nx.gnp_random_graph(random.randint(6, 12), random.random())
+        join = find_2_join(graph, None)
+
+        if join:
+            assert(join.A1 and join.A2 and join.B1 and join.B2)
+
+def test_double_star_cutset(pool : Pool):
+
+    from double_star import find_double_star_cutset
+
+    def brute_force(graph):
+        for u, v in graph.edges:
+            S = neighbourhood(graph, {u, v}) | {u, v}
+            rest = graph.subgraph(vertex_set(graph) - S)
+
+            for x, y in nx.non_edges(graph):
+                if x in rest and y in rest and nx.has_path(graph, x, y) and not nx.has_path(rest, x, y):
+                    return True
+
+        return False
+
+    for i in range(100):
+        graph = nx.gnp_random_graph(random.randint(3, 12), random.uniform(.05, .6))
+        cutset = find_double_star_cutset(graph, pool)
+
+        assert((cutset is not None) == brute_force(graph))
+
+        if cutset:
+            # Some edge uv has S = N[{u, v}]
+            assert(any(neighbourhood(graph, {u, v}) | {u, v} == cutset for u, v in graph.edges))
+
+def test_is_berge_many():
+
+    from berge import BergeRecognizer
+
+    graphs = [nx.cycle_graph(random.randint(4, 12)) for i in range(40)]
+    expected = [graph.number_of_nodes() % 2 == 0 for graph in graphs]
+
+    with BergeRecognizer(2) as recogniser:
+        assert(list(recogniser.is_berge_many(graphs)) == expected)
+
+        # Larger graphs checked in this process, few small ones in flight
+        assert(list(recogniser.is_berge_many(graphs, threshold=10, window=2)) == expected)
+
+        results = dict(recogniser.is_berge_many(graphs, ordered=False))
+
+        assert(sorted(results) == list(range(len(graphs))))
+        assert([results[i] for i in range(len(graphs))] == expected)
+
+def test_pieces():
+
+    from berge import BergeRecognizer, is_berge
+    from bitgraph import BitGraph, size
+    from pieces import pieces, piece_graphs
+
+    for i in range(200):
+        graph = nx.gnp_random_graph(random.randint(1, 14), random.random())
+        G = BitGraph(graph)
+
+        for S in pieces(G):
+            assert(size(S) > 4)
+            assert(len(list(G.components(S))) == 1 and len(list(G.anticomponents(S))) == 1)
+
+        for H in piece_graphs(G):
+            assert(set(map(frozenset, H.to_networkx().edges)) == set(map(frozenset, graph.subgraph(H.labels).edges)))
+
+    assert(pieces(BitGraph(nx.complete_graph(10))) == [])
+    assert(pieces(BitGraph(nx.empty_graph(10))) == [])
+
+    # Three Berge pieces joined together, and then an odd hole added
+    graph = nx.disjoint_union_all([random_chordal(10, .3), nx.cycle_graph(6), random_bipartite(5, 5, .5)])
+    graph = nx.complement(graph)
+
+    assert(len(pieces(BitGraph(graph))) <= 3)
+    assert(is_berge(graph, n_cores=2))
+    assert(not is_berge(nx.disjoint_union(graph, nx.cycle_graph(7)), n_cores=2))
+    assert(not is_berge(nx.complement(nx.disjoint_union(graph, nx.cycle_graph(9))), n_cores=2))
+
+    # Once the C5 is found, the bipartite pieces still out on the pool are
+    # cancelled rather than checked in full (each takes tens of seconds)
+    graph = nx.disjoint_union_all([nx.cycle_graph(5)] + [random_bipartite(14, 14, .3) for i in range(3)])
+
+    start = time.perf_counter()
+
+    with BergeRecognizer(2, fast_path=False) as recogniser:
+        assert(not recogniser.is_berge(graph))
+
+    assert(time.perf_counter() - start < 10)
+
+def test_fast_path():
+
+    from berge import is_berge
+    from bitgraph import BitGraph
+    from fastpath import is_chordal, perfect_class
+
+    for i in range(500):
+        graph = nx.gnp_random_graph(random.randint(0, 10), random.random())
+
+        assert(is_chordal(BitGraph(graph)) == nx.is_chordal(graph))
+
+    for i in range(5):
+        graph = random_bipartite(random.randint(2, 8), random.randint(2, 8), .4)
+
+        assert(perfect_class(BitGraph(graph)) == "bipartite")
+        assert(perfect_class(BitGraph(nx.complement(graph))) == "complement_bipartite")
+
+        # Small ones may be caught as the complement of a bipartite graph first
+        graph = random_chordal(random.randint(5, 15), .3)
+
+        assert(perfect_class(BitGraph(graph)) is not None)
+
+        graph = nx.line_graph(random_bipartite(6, 6, .5))
+
+        assert(perfect_class(BitGraph(graph)) is not None)
+
+    # The line graph of a 6-cycle with two pendant edges on one vertex has
+    # both a triangle and a 6-hole, so is in none of the other classes
+    graph = nx.line_graph(nx.Graph([(0, 1), (1, 2), (2, 3), (3, 4), (4, 5), (5, 0), (0, 6), (0, 7)]))
+
+    assert(perfect_class(BitGraph(graph)) == "line_bipartite")
+    assert(perfect_class(BitGraph(nx.complement(graph))) == "complement_line_bipartite")
+
+    for n in (5, 7, 9):
+        assert(perfect_class(BitGraph(nx.cycle_graph(n))) is None)
+        assert(perfect_class(BitGraph(nx.complement(nx.cycle_graph(n)))) is None)
+
+    # A path with a triangle at one end is chordal, and neither it nor its
+    # complement is bipartite
+    graph = nx.path_graph(8)
+    graph.add_edge(0, 2)
+
+    result, stats = is_berge(nx.complement(graph), n_cores=2, stats=True)
+
+    assert(result and list(stats.classes) == ["complement_chordal"])
+
+    result, stats = is_berge(nx.cycle_graph(8), n_cores=2, stats=True, fast_path=False)
+
+    assert(result and stats.classes == {})
+
+def test_certificates():
+
+    from berge import find_obstruction, find_certificate
+    from bitgraph import BitGraph
+    from certificates import certificate_from, verify_certificate
+
+    assert(verify_certificate(nx.cycle_graph(7), ("hole", tuple(range(7)))))
+    assert(verify_certificate(nx.complement(nx.cycle_graph(7)), ("antihole", tuple(range(7)))))
+
+    assert(not verify_certificate(nx.cycle_graph(6), ("hole", tuple(range(6)))))
+    assert(not verify_certificate(nx.cycle_graph(7), ("hole", (0, 1, 2, 3, 4, 6, 5))))
+    assert(not verify_certificate(nx.cycle_graph(7), ("antihole", tuple(range(7)))))
+    assert(not verify_certificate(nx.cycle_graph(7), ("hole", (0, 1, 2, 3, 4, 5, 7))))
+
+    graph = nx.cycle_graph(7)
+    graph.add_edge(0, 3)
+
+    assert(not verify_certificate(graph, ("hole", tuple(range(7)))))
+
+    # Every detector's frame, on either side, gives a certificate
+    for i in range(100):
+        graph = nx.gnp_random_graph(random.randint(5, 12), random.choice([.2, .5, .8]))
+        G = BitGraph(graph)
+
+        found = find_obstruction(G, None, fast_path=False)
+
+        if found is None:
+            continue
+
+        assert(verify_certificate(graph, certificate_from(G, found)))
+
+    # A pyramid with paths of lengths 1, 4 and 5, joined to a vertex. The
+    # pyramid is found in an anticomponent, and in the whole graph its
+    # paths have shortcuts through the extra vertex.
+    graph = nx.Graph([(0, 1), (1, 2), (0, 2), (0, 3)])
+    nx.add_path(graph, [1, 4, 5, 6, 3])
+    nx.add_path(graph, [2, 7, 8, 9, 10, 3])
+    graph.add_edges_from((11, v) for v in range(11))
+
+    assert(verify_certificate(graph, find_certificate(graph, None)))
+
+    assert(find_certificate(nx.cycle_graph(8), None) is None)
+    assert(find_certificate(nx.complement(nx.cycle_graph(9)), None)[0] == "antihole")
+
+def test_dynamic(pool : Pool):
+
+    from berge import is_berge
+    from certificates import verify_certificate
+    from dynamic import DynamicBergeChecker, hole_through, OutOfBudget
+    from bitgraph import BitGraph
+
+    G = BitGraph(nx.cycle_graph(7))
+
+    assert(hole_through(G, 0, 3) is not None)
+    assert(hole_through(G.complement(), 0, 3) is None)
+    assert(hole_through(BitGraph(nx.cycle_graph(8)), 0, 3) is None)
+
+    try:
+        hole_through(BitGraph(nx.complete_bipartite_graph(6, 6)), 0, 1, budget=10)
+        assert(False)
+    except OutOfBudget:
+        pass
+
+    for i in range(5):
+        graph = nx.gnp_random_graph(random.randint(6, 11), random.random())
+
+        with DynamicBergeChecker(graph, pool=pool) as checker:
+            for j in range(10):
+                u, v = random.sample(list(graph.nodes), 2)
+
+                if graph.has_edge(u, v):
+                    graph.remove_edge(u, v)
+                    result = checker.remove_edge(u, v)
+                else:
+                    graph.add_edge(u, v)
+                    result = checker.add_edge(u, v)
+
+                assert(result == is_berge(graph, pool=pool))
+                assert(result or verify_certificate(graph, checker.certificate))
+
+def test_cache():
+
+    import os
+    import tempfile
+
+    from berge import BergeRecognizer
+    from bitgraph import BitGraph
+    from cache import ENTRIES_PER_KEY, ResultCache
+
+    def relabelled(graph):
+        labels = list(graph.nodes)
+        random.shuffle(labels)
+        return nx.relabel_nodes(graph, dict(zip(graph.nodes, labels)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "results.db")
+
+        cache = ResultCache(maxsize=8, path=path)
+
+        with BergeRecognizer(2, cache=cache) as recogniser:
+            # Cycles are regular, so only the hash and isomorphism test apply
+            for n in range(5, 12):
+                graph = nx.cycle_graph(n)
+
+                assert(recogniser.is_berge(graph) == (n % 2 == 0))
+                assert(recogniser.is_berge(relabelled(graph)) == (n % 2 == 0))
+
+            assert(cache.hits == 7 and cache.misses == 7)
+
+            graph = random_chordal(12, .3)
+
+            assert(recogniser.is_berge(graph))
+            assert(recogniser.is_berge(relabelled(graph)))
+            assert(cache.hits == 8)
+
+        cache.close()
+
+        # A fresh cache reads the earlier results back from disk
+        cache = ResultCache(path=path)
+
+        assert(cache.get(BitGraph(nx.cycle_graph(7))) is False)
+        assert(cache.get(BitGraph(nx.path_graph(7))) is None)
+        assert(cache.stats()["disk_hits"] == 1)
+
+        cache.close()
+
+        # Cubic graphs on 12 vertices all share a hash, and are only kept up
+        # to the limits
+        cache = ResultCache(maxsize=24, path=path)
+        cubic = []
+
+        for seed in range(100):
+            graph = nx.random_regular_graph(3, 12, seed=seed)
+
+            if not any(nx.is_isomorphic(graph, H) for H in cubic):
+                cubic.append(graph)
+
+        for graph in cubic:
+            cache.put(BitGraph(graph), True)
+
+        assert(len(cubic) > ENTRIES_PER_KEY)
+        assert(cache.stats()["size"] == ENTRIES_PER_KEY)
+
+        for n in range(5, 20):
+            cache.put(BitGraph(nx.path_graph(n)), True)
+
+        assert(cache.stats()["size"] <= 24)
+
+        # Reading them back from disk is capped in the same way
+        cache.close()
+        cache = ResultCache(path=path)
+
+        assert(cache.get(BitGraph(cubic[-1])) is True)
+        assert(cache.isomorphism_tests <= ENTRIES_PER_KEY)
+        assert(cache.stats()["size"] == ENTRIES_PER_KEY)
+
+        cache.close()
+
+def test_stats():
+
+    import io
+    import json
+
+    from berge import BergeRecognizer, is_berge
+    from stats import Stats
+
+    result, stats = is_berge(nx.cycle_graph(7), n_cores=2, stats=True)
+
+    assert(result is False and isinstance(stats, Stats))
+    assert(stats.found is not None and stats.found["detector"] in ("jewel", "T2", "T3", "pyramid", "near_cleaner"))
+    assert("is_berge" in stats.phases)
+    assert(any(c["candidates"] >= c["checked"] > 0 for c in stats.counters.values()))
+
+    result, stats = is_berge(nx.cycle_graph(8), n_cores=2, stats=True, fast_path=False)
+
+    assert(result is True and stats.found is None)
+    assert(stats.peaks["cleaners"]["count"] > 0)
+
+    # Pieces of a graph that splits are recorded as well
+    result, stats = is_berge(nx.disjoint_union(nx.cycle_graph(7), nx.path_graph(6)), n_cores=2, stats=True)
+
+    assert(result is False and stats.found is not None)
+    assert(stats.classes == {"bipartite" : 1})
+    assert(any(phase.startswith("is_berge/subgraphs") for phase in stats.phases))
+
+    # Nothing is recorded unless asked for
+    assert(is_berge(nx.cycle_graph(8), n_cores=2) is True)
+
+    log = io.StringIO()
+
+    with BergeRecognizer(2, stats_log=log) as recogniser:
+        recogniser.is_berge(nx.petersen_graph())
+        recogniser.is_berge(nx.cycle_graph(6))
+
+    lines = [json.loads(line) for line in log.getvalue().splitlines()]
+
+    assert([(line["n"], line["berge"]) for line in lines] == [(10, False), (6, True)])
+
+def test_graph6():
+
+    import contextlib
+    import io
+    import os
+    import tempfile
+
+    import cli
+    from graph6 import decode, decode_lines
+
+    for i in range(100):
+        graph = nx.gnp_random_graph(random.choice([1, 5, 12, 63, 64, 100]), random.random())
+        edges = {frozenset(e) for e in graph.edges}
+
+        for encode in (nx.to_graph6_bytes, nx.to_sparse6_bytes):
+            G = decode(encode(graph))
+
+            assert(G.n == graph.number_of_nodes())
+            assert({frozenset(e) for e in G.edges()} == edges)
+
+    graphs = [nx.cycle_graph(n) for n in range(4, 10)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "graphs.g6")
+
+        with open(path, "wb") as f:
+            for graph in graphs:
+                f.write(nx.to_graph6_bytes(graph, header=False))
+
+        out = io.StringIO()
+
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(io.StringIO()):
+            cli.main([path, "-j", "2", "--witness"])
+
+        lines = out.getvalue().splitlines()
+
+        assert(len(lines) == len(graphs))
+
+        for graph, line in zip(graphs, lines):
+            assert(line.startswith("1") == (graph.number_of_nodes() % 2 == 0))
+
+        # A malformed line gets a placeholder, so results still line up with
+        # the input, and is reported with its number
+        with open(path, "wb") as f:
+            f.write(nx.to_graph6_bytes(graphs[0], header=False))
+            f.write(b"Dh\n")
+            f.write(b":~\n")
+            f.write(nx.to_graph6_bytes(graphs[1], header=False))
+            f.write(b"garbage\n")
+
+        out, err = io.StringIO(), io.StringIO()
+
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            cli.main([path, "-j", "2"])
+
+        lines = out.getvalue().splitlines()
+
+        assert(len(lines) == 5)
+        assert(lines[0] == "1" and lines[3] == "0")
+        assert(lines[1].startswith("? line 2:") and lines[2].startswith("? line 3:"))
+        assert(lines[4].startswith("? line 5:"))
+        assert("line 2:" in err.getvalue() and "line 3:" in err.getvalue())
+
+        # With --unordered, lines are prefixed by their input line number
+        out = io.StringIO()
+
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(io.StringIO()):
+            cli.main([path, "-j", "2", "--unordered"])
+
+        lines = dict(line.split(" ", 1) for line in out.getvalue().splitlines())
+
+        assert(lines["1"] == "1" and lines["4"] == "0")
+        assert(all(lines[i].startswith("? line %s:" % i) for i in ("2", "3", "5")))
+        assert(len(lines) == 5)
+
+    errors = []
+    decoded = list(decode_lines([b"Dh\n", b"\n", b"C~\n"], on_error=lambda number, error: errors.append(number)))
+
+    assert(len(decoded) == 1 and errors == [1])
+
+    assert([number for number, graph in decode_lines([b"\n", b"C~\n"], numbered=True)] == [2])
+
+    try:
+        list(decode_lines([b":\n"]))
+        assert(False)
+    except ValueError:
+        pass
+
+def test_benchmark():
+
+    import io
+
+    from benchmark import run, regressions, growth_exponent
+
+    # t = n^3
+    assert(abs(growth_exponent([(n, n ** 3) for n in (4, 8, 16)]) - 3) < 1e-6)
+
+    results, exponents = run(["find_jewel", "cleaning"], ["cycle", "complement_chordal"], [6, 10],
+        lambda: None, repeats=1, budget=10, limit=60, seed=0, log=io.StringIO())
+
+    assert(len(results) == 8)
+    assert(all(r["seconds"] is not None for r in results))
+    assert(set(exponents) == {"find_jewel", "cleaning"})
+
+    baseline = {"results" : [dict(r, seconds=r["seconds"] / 10) for r in results]}
+
+    assert(len(regressions(results, baseline, tolerance=.25, min_seconds=0)) == len(results))
+    assert(regressions(results, {"results" : results}, tolerance=.25, min_seconds=0) == [])
+
+def test_recogniser():
+
+    from berge import BergeRecognizer
+
+    with BergeRecognizer(2) as recogniser:
+        pool = recogniser.pool
+
+        for n in range(4, 10):
+            assert(recogniser.is_berge(nx.cycle_graph(n)) == (n % 2 == 0))
+
+        # The same workers are used for every call
+        assert(recogniser.pool is pool)
+
+    assert(recogniser.pool is None)
+
 def test_is_berge(pool : Pool, alt=False):
     
     if alt:
         from alternate import is_berge_alt as is_berge
     else:
-        from berge import is_berge
+        from berge import is_berge as full_is_berge
+
+        # These graphs would mostly be passed by the fast path
+        def is_berge(graph, pool):
+            return full_is_berge(graph, pool=pool, fast_path=False)
 
     # Note that graphs are perfect iff they are Berge
 
@@ -224,15 +1040,55 @@ def main():
 
         test_random_chordal()
 
-        #test_find_jewel(pool)
+        test_bitgraph()
+
+        test_shared_graph(pool)
 
-        #test_find_pyramid(pool)
+        test_find_jewel(pool)
+
+        test_find_pyramid(pool)
 
         #test_near_cleaners(pool)
 
-        #test_config_T2(pool)
+        test_near_cleaner_tables()
+
+        test_config_T2(pool)
+
+        test_config_T3(pool)
+
+        test_pyramid_combinations()
+
+        test_pyramid_good_pairs()
+
+        test_cleaning()
+
+        test_cleaning_tables()
+
+        test_short_holes(pool)
+
+        test_find_2_join(pool)
+
+        test_double_star_cutset(pool)
+
+        test_recogniser()
+
+        test_pieces()
+
+        test_fast_path()
+
+        test_certificates()
+
+        test_dynamic(pool)
+
+        test_cache()
+
+        test_is_berge_many()
+
+        test_stats()
+
+        test_graph6()
 
-        #test_config_T3(pool)
+        test_benchmark()
 
         test_is_berge(pool)
 
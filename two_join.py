@@ -1,60 +1,79 @@
 import networkx as nx
 
 from util import *
+from bitgraph import BitGraph, as_bitgraph, bit, members, lowest, size
+from parallel import first_result
 
 from multiprocessing import Pool
-from functools import partial
 from itertools import combinations
 import enum
 
-def check_5_hole(vs, graph : nx.Graph):
-    hole = graph.subgraph(vs)
+def grow_hole(graph : BitGraph, path, interior, k):
+    # Extends the induced path v0, v1, ..., v_d to a hole on k vertices
+    # whose smallest vertex is v0, with v1 smaller than the last vertex.
+    # interior is the union of the closed neighbourhoods of v1, ..., v_{d-1};
+    # nothing added later may touch it, which rules out chords as the path
+    # grows.
 
-    if is_cycle(hole):
-        return vs
+    v0, v1, v_d = path[0], path[1], path[-1]
+    adj = graph.adj
 
-def find_5_hole(graph : nx.Graph, pool : Pool):
-    check = partial(check_5_hole, graph=graph)
+    above_v0 = graph.full >> (v0 + 1) << (v0 + 1)
 
+    if len(path) == k - 1:
+        # The last vertex closes the cycle, so it must see v0
+        ends = adj[v_d] & adj[v0] & ~interior & (graph.full >> (v1 + 1) << (v1 + 1))
 
-    if pool is not None:
-        for hole in pool.imap_unordered(check, vertex_combinations(graph, 5), chunksize=4096):
-            if hole:
-                return hole
+        if ends:
+            return path + [lowest(ends)]
 
-    else:
-        for vs in vertex_combinations(graph, 5):
-            hole = check(vs)
+        return None
+
+    interior_next = interior | adj[v_d] | bit(v_d)
+
+    for u in members(adj[v_d] & above_v0 & ~adj[v0] & ~interior):
+        hole = grow_hole(graph, path + [u], interior_next, k)
 
-            if hole:
-                return hole
+        if hole:
+            return hole
 
     return None
 
-def check_7_hole(vs, graph : nx.Graph):
+def check_hole(vs, graph : BitGraph, k):
+    v0, v1 = vs
 
-    hole = graph.subgraph(vs)
+    return grow_hole(graph, [v0, v1], 0, k)
 
-    if is_cycle(hole):
-        return vs
+def check_5_hole(vs, graph : BitGraph):
+    return check_hole(vs, graph, 5)
 
-def find_7_hole(graph : nx.Graph, pool : Pool):
-    check = partial(check_7_hole, graph=graph)
+def check_7_hole(vs, graph : BitGraph):
+    return check_hole(vs, graph, 7)
 
-    if pool is not None:
-        for hole in pool.imap_unordered(check, vertex_combinations(graph, 7), chunksize=4096):
-            if hole:
-                return hole
+def hole_starts(graph : BitGraph):
+    # Each hole is found from its smallest vertex v0 and the smaller of its
+    # two neighbours on the hole.
 
-    else:
-        for vs in vertex_combinations(graph, 7):
-            hole = check(vs)
+    for v0 in range(graph.n):
+        for v1 in members(graph.adj[v0] >> (v0 + 1) << (v0 + 1)):
+            yield (v0, v1)
+
+def find_hole(graph : nx.Graph, check, pool : Pool):
+    graph = as_bitgraph(graph)
+
+    hole = first_result(pool, check, graph, hole_starts(graph), chunksize=64)
 
-            if hole:
-                return hole
+    if hole:
+        return tuple(graph.to_labels(hole))
 
     return None
 
+def find_5_hole(graph : nx.Graph, pool : Pool):
+    return find_hole(graph, check_5_hole, pool)
+
+def find_7_hole(graph : nx.Graph, pool : Pool):
+    return find_hole(graph, check_7_hole, pool)
+
 class TwoJoin():
     def __init__(self):
         self.V1 = set()
@@ -73,83 +92,142 @@ class ValidationResult(enum.Enum):
     RETRY        = enum.auto()
 
 
-def validate_2_join(graph : nx.Graph, join : TwoJoin):
-    if (len(join.V2) == 2 or 
-       (len(join.A2) == len(join.B2) == 1 and 
-        nx.is_simple_path(graph, join.V2))):
-            
+def validate_2_join(graph : BitGraph, join : TwoJoin):
+    # join holds masks here. "Is a path" means that the set induces a path.
+
+    if (size(join.V2) == 2 or
+       (size(join.A2) == size(join.B2) == 1 and
+        graph.is_path(join.V2))):
+
             return ValidationResult.NO_2_JOIN
 
-    elif (len(join.A1) >= 2 or 
-          len(join.B1) >= 2 or 
-          not nx.is_simple_path(graph, join.V1)):
+    elif (size(join.A1) >= 2 or
+          size(join.B1) >= 2 or
+          not graph.is_path(join.V1)):
 
             return ValidationResult.VALID_2_JOIN
 
     else:
         return ValidationResult.RETRY
 
-def apply_movement_rules(graph : nx.Graph, V1, V2, a1, a2, b1, b2):
+class MovementState():
+    # The state of the movement rules for a fixed a2, b2, as masks. Every
+    # mask only grows (or, for the complete ones, shrinks) as vertices move
+    # into V1, so each moved vertex is folded in once.
+    #
+    # A vertex v of V2 with neighbours in A1 | B1 stays put iff its
+    # neighbours there are exactly A1 or exactly B1, that is, iff it is
+    # complete to A1 and misses B1 - A1, or the other way round.
+
+    def __init__(self, graph : BitGraph, a2, b2):
+        self.graph = graph
+        self.N_a2 = graph.adj[a2]
+        self.N_b2 = graph.adj[b2]
+
+        # a2 and b2 are in V2 by definition, and vertices complete to both
+        # can never be in V1
+        self.forbidden = (self.N_a2 & self.N_b2) | bit(a2) | bit(b2)
+
+        self.V1 = 0
+        self.A1 = 0
+        self.B1 = 0
 
-    to_move = V1
+        self.N_S = 0         # N(V1 - (A1 | B1))
+        self.N_AB = 0        # N(A1 | B1)
+        self.N_A_only = 0    # N(A1 - B1)
+        self.N_B_only = 0    # N(B1 - A1)
+        self.C_A = graph.full  # A1-complete vertices
+        self.C_B = graph.full  # B1-complete vertices
 
-    res = TwoJoin()
+    def copy(self):
+        state = MovementState.__new__(MovementState)
+        state.__dict__.update(self.__dict__)
+        return state
 
-    res.V2 = V1 | V2
-    res.V1 = set()
+    def move(self, to_move):
+        # Moves to_move into V1 and closes V1 under the movement rules.
+        # Returns False if a forbidden vertex would have to move.
 
-    forbidden = complete_verts(graph, {a2, b2})
+        adj = self.graph.adj
 
-    N_a2 = neighbourhood(graph, a2)
-    N_b2 = neighbourhood(graph, b2)
+        while to_move:
+            if to_move & self.forbidden:
+                return False
 
-    while not empty(to_move):
-        if not to_move.isdisjoint(forbidden):
-            return None
+            self.V1 |= to_move
 
-        res.V1.update(to_move)
-        res.V2 -= to_move
-        to_move.clear()
+            for x in members(to_move):
+                in_A = self.N_a2 >> x & 1
+                in_B = self.N_b2 >> x & 1
 
-        res.A1 = res.V1 & N_a2
-        res.B1 = res.V1 & N_b2
-        AB = (res.A1 | res.B1)
-        S = res.V1 - AB
+                if in_A:
+                    self.A1 |= bit(x)
+                    self.C_A &= adj[x]
+                if in_B:
+                    self.B1 |= bit(x)
+                    self.C_B &= adj[x]
 
-        to_move.update(res.V2 & neighbourhood(graph, S))
+                if in_A and not in_B:
+                    self.N_A_only |= adj[x]
+                elif in_B and not in_A:
+                    self.N_B_only |= adj[x]
 
-        for v in (res.V2 & neighbourhood(graph, AB)):
-            if not (neighbourhood(graph, v) & AB) in (res.A1, res.B1):
-                to_move.add(v)
+                if in_A or in_B:
+                    self.N_AB |= adj[x]
+                else:
+                    self.N_S |= adj[x]
 
-    res.A2 = res.V2 & neighbourhood(graph, res.A1)
-    res.B2 = res.V2 & neighbourhood(graph, res.B1)
+            stays = (self.C_A & ~self.N_B_only) | (self.C_B & ~self.N_A_only)
 
-    return res
+            to_move = ~self.V1 & self.graph.full & (self.N_S | (self.N_AB & ~stays))
 
-def two_join_combinations(graph : nx.Graph):
+        return True
+
+    def join(self):
+        res = TwoJoin()
+
+        res.V1 = self.V1
+        res.V2 = self.graph.full & ~self.V1
+        res.A1 = self.A1
+        res.B1 = self.B1
+        res.A2 = res.V2 & self.graph.neighbourhood(self.A1)
+        res.B2 = res.V2 & self.graph.neighbourhood(self.B1)
+
+        return res
+
+def apply_movement_rules(graph : BitGraph, V1, a2, b2):
+    # Returns the closure of V1 under the movement rules as a TwoJoin of
+    # masks, or None if it would swallow a2, b2 or a vertex complete to both.
+
+    state = MovementState(graph, a2, b2)
+
+    if not state.move(V1):
+        return None
+
+    return state.join()
+
+def two_join_combinations(graph : BitGraph):
+
+    for (a1, a2), (b1, b2) in combinations(graph.edges(), 2):
 
-    for (a1, a2), (b1, b2) in combinations(graph.edges, 2):
-        
         if graph.has_edge(a1, b2) or graph.has_edge(a2, b1):
             continue
 
-        for u in vertex_set(graph) - (complete_verts(graph, {a2, b2}) ):
-            
-            if distinct((a1, a2, b1, b2, u)):
-                yield (a1, a2, b1, b2, u)
+        excluded = graph.complete_verts(bit(a2) | bit(b2)) | bit(a1) | bit(a2) | bit(b1) | bit(b2)
 
-def check_2_join(vs, graph : nx.Graph):
-    a1, a2, b1, b2, u = vs
+        for u in members(graph.full & ~excluded):
+            yield (a1, a2, b1, b2, u)
 
-    V1 = {a1, b1, u}
-    V2 = vertex_set(graph) - V1
+def check_2_join(vs, graph : BitGraph):
+    a1, a2, b1, b2, u = vs
 
-    join = apply_movement_rules(graph, V1, V2, a1, a2, b1, b2)
+    state = MovementState(graph, a2, b2)
 
-    if join is None:
+    if not state.move(bit(a1) | bit(b1) | bit(u)):
         return None
 
+    join = state.join()
+
     res = validate_2_join(graph, join)
 
     if res == ValidationResult.NO_2_JOIN:
@@ -159,35 +237,33 @@ def check_2_join(vs, graph : nx.Graph):
         return join
 
     elif res == ValidationResult.RETRY:
-        for h in join.V2 - {a2, b2}:
-            new_V1 = {a1, b1, u, h}
-            new_V2 = vertex_set(graph) - new_V1
+        # The rules only ever add to V1, so the closure of {a1, b1, u, h} is
+        # the closure of the one just found with h added. Each retry picks
+        # up from the shared state rather than starting over.
 
-            join = apply_movement_rules(graph, new_V1, new_V2, a1, a2, b1, b2)
+        for h in members(join.V2 & ~bit(a2) & ~bit(b2)):
+            retry = state.copy()
 
-            if join is None:
+            if not retry.move(bit(h)):
                 continue
 
+            join = retry.join()
+
             if validate_2_join(graph, join) == ValidationResult.VALID_2_JOIN:
                 return join
 
     return None
 
 def find_2_join(graph : nx.Graph, pool : Pool):
-    check = partial(check_2_join, graph=graph)
+    graph = as_bitgraph(graph)
 
-    if pool is not None:
-        for join in pool.imap_unordered(check, two_join_combinations(graph), chunksize=4096):
-            if join:
-                return join
+    join = first_result(pool, check_2_join, graph, two_join_combinations(graph), chunksize=4096)
 
-    else:
-        for vs in two_join_combinations(graph):
-            join = check(vs)
-            if join:
-                return join
+    if join:
+        for name in ("V1", "V2", "A1", "A2", "B1", "B2"):
+            setattr(join, name, set(graph.to_labels(getattr(join, name))))
 
-    return None
+    return join
 
 def block(graph : nx.Graph, V1, V2, A2, B2):
     
@@ -2,6 +2,8 @@
 
 import networkx as nx
 
+from bitgraph import BitGraph
+
 from itertools import combinations, permutations, chain
 
 import uuid
@@ -216,7 +218,13 @@ def components(graph : nx.Graph, S : set):
     return (set(comp) for comp in nx.connected_components(graph.subgraph(S)))
 
 def anticomponents(graph : nx.Graph, S : set):
-    return components(nx.complement(graph), S)
+    # Worked out on the complement of the bitset graph of G|S, rather than
+    # building the complement of all of G.
+
+    G = BitGraph(graph.subgraph(S))
+    Gc = G.complement()
+
+    return (set(G.to_labels(comp)) for comp in Gc.components(Gc.full))
 
 
 def path_through(graph : nx.Graph, S, u, v):